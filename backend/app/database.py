@@ -1,13 +1,141 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Driver-qualified URL for the async engine; derived from DATABASE_URL if unset
+# (drivers are listed in requirements.txt)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+# Schemes that are already async and are used unchanged
+ASYNC_SCHEMES = {"postgresql+asyncpg", "postgresql+psycopg", "sqlite+aiosqlite", "mysql+aiomysql", "mysql+asyncmy"}
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+def _async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+
+    if scheme in ASYNC_SCHEMES:
+        return url
+
+    if scheme not in ASYNC_DRIVERS:
+        raise RuntimeError(
+            f"No async driver known for DATABASE_URL scheme '{scheme}'; "
+            "set ASYNC_DATABASE_URL to a driver-qualified URL"
+        )
+
+    return f"{ASYNC_DRIVERS[scheme]}{sep}{rest}"
+
+
+class PoolMetrics:
+    """
+    Checkout counts and time spent waiting for a pooled connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "pool": pool.status(),
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "checkouts": checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.wait_seconds_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "max_wait_ms": round(self.wait_seconds_max * 1000, 3)
+            }
+
+
+def _instrumented(pool_class, metrics: PoolMetrics):
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.monotonic()
+            try:
+                connection = super()._do_get()
+            except Exception:
+                metrics.record_wait(time.monotonic() - start, timed_out=True)
+                raise
+            metrics.record_wait(time.monotonic() - start)
+            return connection
+
+    return InstrumentedPool
+
+
+def _engine_kwargs(url: str, pool_class, metrics: PoolMetrics) -> dict:
+    kwargs = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    # SQLite picks its own pool type; size/overflow settings don't apply
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            poolclass=_instrumented(pool_class, metrics),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+
+    return kwargs
+
+
+def _track(sync_engine, metrics: PoolMetrics):
+    event.listen(sync_engine, "checkout", lambda *args: metrics.increment("checkouts"))
+    event.listen(sync_engine, "checkin", lambda *args: metrics.increment("checkins"))
+    event.listen(sync_engine, "connect", lambda *args: metrics.increment("connects"))
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL, QueuePool, sync_pool_metrics))
+
+_track(engine, sync_pool_metrics)
+
+# Created on first use, so sync-only processes (CLI tools, workers)
+# need neither the async driver nor a mappable URL
+async_engine = None
+_async_engine_lock = threading.Lock()
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -15,6 +143,32 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# expire_on_commit=False: attributes stay readable after commit without
+# an implicit (and, under asyncio, illegal) lazy refresh. Bound to the
+# async engine by get_async_engine().
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+def get_async_engine():
+    global async_engine
+
+    if async_engine is None:
+        with _async_engine_lock:
+            if async_engine is None:
+                url = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+                created = create_async_engine(
+                    url,
+                    **_engine_kwargs(url, AsyncAdaptedQueuePool, async_pool_metrics)
+                )
+                _track(created.sync_engine, async_pool_metrics)
+                AsyncSessionLocal.configure(bind=created)
+                async_engine = created
+    return async_engine
+
 Base = declarative_base()
 
 def get_db():
@@ -22,4 +176,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats():
+    return {
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+        "async": async_pool_metrics.snapshot(async_engine.sync_engine.pool) if async_engine else None
+    }
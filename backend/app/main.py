@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from dotenv import load_dotenv
+import os
+import threading
 
 load_dotenv()
 
@@ -11,12 +14,41 @@ import app.models  # IMPORTANT: loads all models
 from app.routes.auth import router as auth_router
 from app.routes.study_plans import router as study_plans_router
 from app.routes.rag import router as rag_router
+from app.routes.metrics import router as metrics_router
+from app.services.ai_jobs import ai_job_queue
+from app.services.document_registry import document_registry
+from app.services.providers import loaded_resources, warm_up
+
+# Load the embedding model and LLM clients at boot instead of on first use
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+warmup_state = {"done": False, "error": None}
 
 
 app = FastAPI(title="Planora API")
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+
+def run_warm_up():
+    try:
+        warm_up()
+        warmup_state["done"] = True
+    except Exception as e:
+        warmup_state["error"] = str(e)
+
+
+@app.on_event("startup")
+def on_startup():
+    # Create tables
+    Base.metadata.create_all(bind=engine)
+
+    # Heartbeats for this worker's ingestions and AI jobs; also rolls back
+    # those left behind by workers that died
+    document_registry.start()
+    ai_job_queue.start()
+
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=run_warm_up, name="warm-up", daemon=True).start()
+
 
 # Allow frontend connection
 origins = [
@@ -29,6 +61,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.get("/")
@@ -39,6 +72,37 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Unlike /health, only reports ready once the database answers and
+    (when enabled) warm-up has finished.
+    """
+
+    checks = {}
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception:
+        checks["database"] = False
+
+    if WARMUP_ON_STARTUP:
+        checks["warm_up"] = warmup_state["done"]
+
+    ready = all(checks.values())
+
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "resources": loaded_resources(),
+            "warm_up_error": warmup_state["error"]
+        }
+    )
+
 @app.get("/db-test")
 def db_test():
     with engine.connect() as connection:
@@ -49,4 +113,5 @@ def db_test():
 # Routers
 app.include_router(auth_router)
 app.include_router(study_plans_router)
-app.include_router(rag_router)
\ No newline at end of file
+app.include_router(rag_router)
+app.include_router(metrics_router)
\ No newline at end of file
@@ -1,3 +1,5 @@
 from .user import User
 from .study_plan import StudyPlan
-from .plan_progress import PlanProgress
\ No newline at end of file
+from .plan_progress import PlanProgress
+from .plan_stats import PlanStats
+from .plan_day import PlanDay, PlanTask
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Date, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class PlanDay(Base):
+    __tablename__ = "plan_days"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    study_plan_id = Column(Integer, ForeignKey("study_plans.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    hours = Column(Integer, nullable=True)
+
+    study_plan = relationship("StudyPlan")
+    tasks = relationship("PlanTask", order_by="PlanTask.position", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        UniqueConstraint("study_plan_id", "date", name="uq_plan_days_plan_date"),
+    )
+
+
+class PlanTask(Base):
+    __tablename__ = "plan_tasks"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    plan_day_id = Column(Integer, ForeignKey("plan_days.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+
+    # "Topic - Activity" tasks keep the topic here; generic tasks have none
+    topic = Column(String, nullable=True, index=True)
+    description = Column(Text, nullable=False)
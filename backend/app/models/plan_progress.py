@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, Date, Boolean, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -14,4 +14,11 @@ class PlanProgress(Base):
     completion_percentage = Column(Integer, default=0)
     notes = Column(Text, nullable=True)
 
-    study_plan = relationship("StudyPlan")
\ No newline at end of file
+    study_plan = relationship("StudyPlan")
+
+    __table_args__ = (
+        # One row per plan day; also the (plan, date) index analytics scans.
+        # Databases created before this was unique get it from
+        # `python -m app.services.plan_store migrate`.
+        Index("uq_plan_progress_plan_date", "study_plan_id", "date", unique=True),
+    )
\ No newline at end of file
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+class PlanStats(Base):
+    """
+    Running totals over a plan's plan_progress rows, kept in step with
+    every write so analytics can read one row instead of scanning.
+    """
+
+    __tablename__ = "plan_stats"
+
+    study_plan_id = Column(Integer, ForeignKey("study_plans.id"), primary_key=True)
+
+    total_days = Column(Integer, nullable=False, default=0)
+    completed_days = Column(Integer, nullable=False, default=0)
+    percentage_sum = Column(Integer, nullable=False, default=0)
+    last_activity_date = Column(Date, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    study_plan = relationship("StudyPlan")
@@ -15,6 +15,7 @@ class StudyPlan(Base):
     study_hours_per_day = Column(Integer, nullable=False)
     level = Column(String, nullable=False)
 
+    # Legacy JSON schedule; days now live in plan_days / plan_tasks
     plan_content = Column(Text, nullable=True)
     status = Column(String, default="active")
 
@@ -1,21 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse
-from app.utils.security import hash_password
+from app.utils.security import hash_password_async, PasswordHasherBusy
 from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# bcrypt runs on the dedicated hasher pool and DB calls on the async
+# engine, so these handlers hold no thread while waiting
+busy_exception = HTTPException(
+    status_code=503,
+    detail="Too many login attempts in progress, please retry",
+    headers={"Retry-After": "1"}
+)
+
+
+async def find_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
 @router.post("/signup", response_model=UserResponse)
-def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await find_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = hash_password(user_data.password)
+    try:
+        hashed_pw = await hash_password_async(user_data.password)
+    except PasswordHasherBusy:
+        raise busy_exception
 
     new_user = User(
         name=user_data.name,
@@ -24,27 +42,37 @@ def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
-from app.utils.security import verify_password, create_access_token
+from app.utils.security import verify_and_update_password_async, create_access_token, token_claims_for
 
 @router.post("/login")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await find_user_by_email(db, form_data.username)
 
     if not user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    if not verify_password(form_data.password, user.password_hash):
+    try:
+        valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise busy_exception
+
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    access_token = create_access_token(data={"sub": str(user.id)})
+    # Transparently move the stored hash to the configured bcrypt cost
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+
+    access_token = create_access_token(data=token_claims_for(user))
 
     return {
         "access_token": access_token,
@@ -58,4 +86,4 @@ def read_current_user(current_user: User = Depends(get_current_user)):
         "id": current_user.id,
         "name": current_user.name,
         "email": current_user.email
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+from app.database import pool_stats
+from app.services.llm_cache import cache_stats
+from app.services.embedding_service import embedding_cache
+from app.services.llm_gateway import llm_gateway
+from app.utils.security import get_metrics_admin, password_hasher
+
+# Pool, cache and gateway internals are for operators only
+router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(get_metrics_admin)])
+
+
+@router.get("/llm-cache")
+def llm_cache_metrics():
+    return cache_stats()
+
+
+@router.get("/llm-gateway")
+def llm_gateway_metrics():
+    return llm_gateway.stats()
+
+
+@router.get("/embedding-cache")
+def embedding_cache_metrics():
+    return embedding_cache.stats()
+
+
+@router.get("/password-hashing")
+def password_hashing_metrics():
+    return password_hasher.stats()
+
+
+@router.get("/db-pool")
+def db_pool_metrics():
+    return pool_stats()
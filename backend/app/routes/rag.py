@@ -1,21 +1,156 @@
-from fastapi import APIRouter, UploadFile, File
-import shutil
-from app.services.rag_service import process_pdf, answer_question
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import hashlib
+import os
+import uuid
+from app.models.user import User
+from app.utils.security import get_current_user
+from app.schemas.rag import AskBatchRequest, AskBatchResponse
+from app.services.rag_service import answer_question, answer_questions, stream_answer
+from app.services.document_registry import delete_document, document_registry
+from app.services.ingestion_jobs import submit_ingestion, get_job
+from app.services.vector_store import namespace_exists, namespace_for, user_namespaces
+from app.utils.sse import sse_stream
 
 router = APIRouter(prefix="/rag", tags=["RAG"])
 
 
-@router.post("/upload")
-def upload_pdf(file: UploadFile = File(...)):
-    file_path = f"temp_{file.filename}"
+def _ingest_upload(file: UploadFile, namespace: str, user: User):
+    # Unique name so concurrent uploads of the same file don't clobber each other
+    file_path = f"temp_{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
 
+    # Hash while copying so identical re-uploads can be skipped
+    digest = hashlib.sha256()
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        for block in iter(lambda: file.file.read(1 << 20), b""):
+            digest.update(block)
+            buffer.write(block)
 
-    return process_pdf(file_path)
+    job = submit_ingestion(file_path, namespace, user.id, file.filename, digest.hexdigest())
+
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "document_id": job["namespace"].split("/", 1)[1]
+    }
+
+
+@router.post("/upload", status_code=202)
+def upload_pdf(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    document_id = os.path.splitext(file.filename)[0]
+    return _ingest_upload(file, namespace_for(current_user.id, document_id), current_user)
+
+
+@router.get("/documents")
+def list_documents(current_user: User = Depends(get_current_user)):
+    return [
+        {
+            "document_id": document["namespace"].split("/", 1)[1],
+            "filename": document["filename"],
+            "status": document["status"],
+            "chunks": document["chunks"],
+            "created_at": document["created_at"]
+        }
+        for document in document_registry.for_user(current_user.id)
+    ]
+
+
+@router.put("/documents/{document_id}", status_code=202)
+def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Index a new version of a document; the old chunks are removed once
+    the new ones are searchable.
+    """
+
+    namespace = namespace_for(current_user.id, document_id)
+
+    if not namespace_exists(namespace):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return _ingest_upload(file, namespace, current_user)
+
+
+@router.delete("/documents/{document_id}")
+def remove_document(
+    document_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    result = delete_document(namespace_for(current_user.id, document_id))
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+
+    return {"document_id": document_id, "chunks_removed": result["chunks_removed"]}
+
+
+@router.get("/jobs/{job_id}")
+def get_ingestion_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    job = get_job(job_id)
+
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "pages_total": job["pages_total"],
+        "pages_processed": job["pages_processed"],
+        "chunks_added": job["chunks_added"],
+        "chunks_skipped": job["chunks_skipped"],
+        "chunks_replaced": job["chunks_replaced"],
+        "document_id": job["namespace"].split("/", 1)[1],
+        "error": job["error"]
+    }
+
+
+def _caller_namespaces(user: User, document_id: Optional[str]):
+    # Only ever search the caller's own uploads
+    if document_id:
+        return [namespace_for(user.id, document_id)]
+    return user_namespaces(user.id)
 
 
 @router.post("/ask")
-def ask_question(question: str):
-    answer = answer_question(question)
-    return {"answer": answer}
\ No newline at end of file
+def ask_question(
+    question: str,
+    document_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    answer = answer_question(question, _caller_namespaces(current_user, document_id))
+    return {"answer": answer}
+
+
+@router.post("/ask-batch", response_model=AskBatchResponse)
+def ask_questions(
+    batch: AskBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    answers = answer_questions(batch.questions, _caller_namespaces(current_user, batch.document_id))
+    return {"answers": answers}
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(
+    question: str,
+    document_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    # Listing the caller's namespaces reads the filesystem
+    namespaces = await run_in_threadpool(_caller_namespaces, current_user, document_id)
+    tokens = stream_answer(question, namespaces)
+    return StreamingResponse(sse_stream(tokens), media_type="text/event-stream")
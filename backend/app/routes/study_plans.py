@@ -1,29 +1,80 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
-import json
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from fastapi import HTTPException
 from app.models.plan_progress import PlanProgress
-from datetime import datetime
+from datetime import date
+import os
 from app.schemas.plan_progress import PlanProgressUpdate, PlanProgressResponse
-from app.database import get_db
+from app.database import get_async_db
 from app.models.study_plan import StudyPlan
-from app.schemas.study_plan import StudyPlanCreate, StudyPlanResponse
-from app.utils.security import get_current_user
+from app.schemas.study_plan import CohortPlanCreate, CohortPlanResult, StudyPlanCreate, StudyPlanResponse
+from app.utils.security import get_current_db_user, get_current_user
 from app.models.user import User
 from app.services.plan_generator import generate_structured_plan
 from app.services.analytics_service import calculate_plan_analytics
+from app.services.cohort_service import create_cohort_plans
 from app.services.adaptive_engine import adapt_study_plan
-from app.services.ai_service import generate_ai_feedback
-from app.services.ai_adaptive_engine import adapt_study_plan_with_ai
+from app.services.ai_service import prepare_ai_feedback, stream_ai_feedback
+from app.services.ai_jobs import AI_ADAPT, AI_FEEDBACK, ai_job_queue
+from app.services.llm_cache import invalidate_plan
+from app.services.plan_stats_service import apply_progress_change, init_plan_stats, lock_progress
+from app.services.plan_store import insert_plan_days, load_plan_days
+from app.utils.sse import sse_stream
 
 router = APIRouter(prefix="/plans", tags=["Study Plans"])
 
+# Accounts allowed to create plans on behalf of other users
+COHORT_ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.getenv("COHORT_ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+
+# Plan list pagination: page size when only a cursor is given, and the
+# response header carrying the next cursor
+PLAN_PAGE_DEFAULT = 20
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Handlers use the async session. Sync services (analytics, adaptation)
+# run through AsyncSession.run_sync; non-streaming LLM calls are queued
+# as background jobs (see ai_jobs) so they never hold a request open.
+
+
+async def get_owned_plan(db: AsyncSession, plan_id: int, user_id: int):
+    result = await db.execute(
+        select(StudyPlan).where(
+            StudyPlan.id == plan_id,
+            StudyPlan.user_id == user_id
+        )
+    )
+    plan = result.scalars().first()
+
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
+    return plan
+
+
+def get_owned_job(job_id: str, user_id: int):
+    job = ai_job_queue.get(job_id)
+
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+def job_status(job: dict):
+    return {key: value for key, value in job.items() if key not in ("result", "user_id")}
+
 
 @router.post("/", response_model=StudyPlanResponse)
-def create_study_plan(
+async def create_study_plan(
     plan_data: StudyPlanCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     generated_plan = generate_structured_plan(
@@ -40,54 +91,125 @@ def create_study_plan(
         exam_date=plan_data.exam_date,
         study_hours_per_day=plan_data.study_hours_per_day,
         level=plan_data.level,
-        plan_content=json.dumps(generated_plan),
         status="active"
     )
 
     db.add(new_plan)
-    db.commit()
-    db.refresh(new_plan)
-    from datetime import datetime
+    await db.flush()  # assigns new_plan.id without committing
 
-    parsed_plan = json.loads(new_plan.plan_content)
+    # One executemany for all days, in the same transaction as the plan
+    if generated_plan:
+        await db.execute(insert(PlanProgress), [
+            {
+                "study_plan_id": new_plan.id,
+                "date": date.fromisoformat(day["date"])
+            }
+            for day in generated_plan
+        ])
 
-    for day in parsed_plan:
-        progress_entry = PlanProgress(
-            study_plan_id=new_plan.id,
-            date=datetime.strptime(day["date"], "%Y-%m-%d").date()
-        )
-        db.add(progress_entry)
+    await db.run_sync(insert_plan_days, new_plan.id, generated_plan, plan_data.study_hours_per_day)
+
+    init_plan_stats(db, new_plan.id, len(generated_plan))
 
-    db.commit()
-    
+    await db.commit()
+    await db.refresh(new_plan)
 
     return new_plan
 
 
 
+@router.post("/cohort", response_model=CohortPlanResult)
+async def create_cohort_study_plans(
+    cohort_data: CohortPlanCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_db_user)
+):
+    # Email read from the database, not the token, so revocation is immediate
+    if current_user.email.lower() not in COHORT_ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    result = await db.run_sync(create_cohort_plans, cohort_data, cohort_data.members)
+
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+
+    return result
+
+
 @router.get("/", response_model=List[StudyPlanResponse])
-def get_my_study_plans(
-    db: Session = Depends(get_db),
+async def get_my_study_plans(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Newest plans first. Without `limit` every plan is returned, as
+    before. With it the list is keyset-paginated on id: the
+    X-Next-Cursor header, when present, is the `cursor` for the next page.
+    """
+
+    query = select(StudyPlan).where(StudyPlan.user_id == current_user.id)
+
+    if cursor is not None:
+        query = query.where(StudyPlan.id < cursor)
+        limit = limit or PLAN_PAGE_DEFAULT
+
+    query = query.order_by(StudyPlan.id.desc())
+
+    if limit is None:
+        return (await db.execute(query)).scalars().all()
+
+    # One extra row tells us whether another page exists
+    plans = (await db.execute(query.limit(limit + 1))).scalars().all()
+
+    if len(plans) > limit:
+        response.headers[NEXT_CURSOR_HEADER] = str(plans[limit - 1].id)
+
+    return plans[:limit]
+
+
+# Declared before /{plan_id} so "jobs" is not parsed as a plan id
+@router.get("/jobs/{job_id}")
+async def get_ai_job(
+    job_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    plans = db.query(StudyPlan).filter(
-        StudyPlan.user_id == current_user.id
-    ).all()
+    return job_status(get_owned_job(job_id, current_user.id))
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_ai_job_result(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    job = get_owned_job(job_id, current_user.id)
+
+    if job["status"] == "failed":
+        raise HTTPException(status_code=502, detail=job["error"])
+
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    return job["result"]
+
 
-    return plans
 @router.get("/{plan_id}")
-def get_single_plan(
+async def get_single_plan(
     plan_id: int,
-    db: Session = Depends(get_db),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
 
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
+    plan = await get_owned_plan(db, plan_id, current_user.id)
+
+    # Only the requested window of days is read
+    plan_days = await db.run_sync(load_plan_days, plan, from_date, to_date)
 
     return {
         "id": plan.id,
@@ -97,54 +219,60 @@ def get_single_plan(
         "study_hours_per_day": plan.study_hours_per_day,
         "level": plan.level,
         "status": plan.status,
-        "plan_content": json.loads(plan.plan_content) if plan.plan_content else []
+        "plan_content": plan_days
     }
 @router.patch("/progress/{progress_id}", response_model=PlanProgressResponse)
-def update_progress(
+async def update_progress(
     progress_id: int,
     update_data: PlanProgressUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    progress = db.query(PlanProgress).filter(
-        PlanProgress.id == progress_id
-    ).first()
+    # Row lock: the stats delta below is computed from these old values
+    progress = (await db.execute(lock_progress(progress_id))).scalars().first()
 
     if not progress:
         raise HTTPException(status_code=404, detail="Progress entry not found")
 
     # Ensure user owns this plan
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == progress.study_plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(StudyPlan.id).where(
+            StudyPlan.id == progress.study_plan_id,
+            StudyPlan.user_id == current_user.id
+        )
+    )
 
-    if not plan:
+    if result.scalar() is None:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    await db.run_sync(
+        apply_progress_change,
+        progress.study_plan_id,
+        progress.completed,
+        progress.completion_percentage,
+        update_data.completed,
+        update_data.completion_percentage
+    )
+
     progress.completed = update_data.completed
     progress.completion_percentage = update_data.completion_percentage
     progress.notes = update_data.notes
 
-    db.commit()
-    db.refresh(progress)
+    await db.commit()
+    await db.refresh(progress)
+
+    invalidate_plan(progress.study_plan_id)
 
     return progress
 @router.get("/{plan_id}/analytics")
-def get_plan_analytics(
+async def get_plan_analytics(
     plan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    await get_owned_plan(db, plan_id, current_user.id)
 
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-
-    analytics = calculate_plan_analytics(db, plan_id)
+    analytics = await db.run_sync(calculate_plan_analytics, plan_id)
 
     if not analytics:
         raise HTTPException(status_code=404, detail="No progress data found")
@@ -152,42 +280,56 @@ def get_plan_analytics(
     return analytics
 
 @router.post("/{plan_id}/adapt")
-def adapt_plan(
+async def adapt_plan(
     plan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    await get_owned_plan(db, plan_id, current_user.id)
 
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-
-    result = adapt_study_plan(db, plan_id)
+    result = await db.run_sync(adapt_study_plan, plan_id)
+    invalidate_plan(plan_id)
 
     if not result:
         raise HTTPException(status_code=400, detail="Adaptation failed")
 
     return result
-@router.post("/{plan_id}/ai-feedback")
-def ai_feedback(
+@router.post("/{plan_id}/ai-feedback", status_code=202)
+async def ai_feedback(
     plan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    await get_owned_plan(db, plan_id, current_user.id)
 
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
+    return job_status(ai_job_queue.submit(AI_FEEDBACK, plan_id, current_user.id))
+
+
+@router.post("/{plan_id}/ai-feedback/stream")
+async def ai_feedback_stream(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    await get_owned_plan(db, plan_id, current_user.id)
+
+    prepared = await db.run_sync(prepare_ai_feedback, plan_id)
+
+    if isinstance(prepared, dict):
+        raise HTTPException(status_code=404, detail=prepared["error"])
+
+    context_prompt, risk_index = prepared
 
-    feedback = generate_ai_feedback(db, plan_id)
+    return StreamingResponse(
+        sse_stream(stream_ai_feedback(plan_id, context_prompt), final={"risk_index": risk_index}),
+        media_type="text/event-stream"
+    )
+@router.post("/{plan_id}/ai-adapt", status_code=202)
+async def ai_adapt_plan(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    await get_owned_plan(db, plan_id, current_user.id)
 
-    return {"ai_feedback": feedback}
-@router.post("/{plan_id}/ai-adapt")
-def ai_adapt_plan(plan_id: int, db: Session = Depends(get_db)):
-    return adapt_study_plan_with_ai(db, plan_id)
\ No newline at end of file
+    return job_status(ai_job_queue.submit(AI_ADAPT, plan_id, current_user.id))
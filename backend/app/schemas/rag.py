@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class AskBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=20)
+    document_id: Optional[str] = None
+
+class BatchAnswer(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+class AskBatchResponse(BaseModel):
+    answers: List[BatchAnswer]
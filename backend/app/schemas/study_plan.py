@@ -20,4 +20,21 @@ class StudyPlanResponse(BaseModel):
     status: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CohortMember(BaseModel):
+    user_id: int
+    level: str
+    study_hours_per_day: int
+
+class CohortPlanCreate(BaseModel):
+    exam_name: str
+    subject: str
+    exam_date: date
+    topics: List[str]
+    members: List[CohortMember]
+
+class CohortPlanResult(BaseModel):
+    plans_created: int
+    schedules_generated: int
+    plan_ids: List[int]
@@ -1,10 +1,20 @@
 from sqlalchemy.orm import Session
 from datetime import date
-import json
 
 from app.models.study_plan import StudyPlan
 from app.models.plan_progress import PlanProgress
 from app.services.analytics_service import calculate_plan_analytics
+from app.services.plan_stats_service import refresh_plan_stats
+from app.services.plan_store import (
+    delete_plan_days,
+    diff_plan_days,
+    ensure_plan_days,
+    insert_plan_days,
+    load_plan_days,
+    plan_topics,
+    reset_progress,
+    task_topic
+)
 from app.services.plan_generator import generate_structured_plan
 from app.services.ai_service import calculate_risk_index
 
@@ -47,21 +57,21 @@ def adapt_study_plan(db: Session, plan_id: int):
         new_hours = plan.study_hours_per_day
 
     # ---------- Dynamic Topics ----------
-    # Extract topics from existing plan instead of hardcoding
-    existing_plan = plan.plan_content
-    if isinstance(existing_plan, str):
-        existing_plan = json.loads(existing_plan)
-
-    topics = list({
-        task.split(" - ")[0]
-        for day in existing_plan
-        for task in day["tasks"]
-        if " - " in task
-    })
+    # Read topics from the existing plan instead of hardcoding
+    topics = plan_topics(db, plan)
 
     if not topics:
         topics = ["Core Concepts"]
 
+    # Start the rotation at today's scheduled topic so unchanged days line up
+    today = date.today()
+    todays_plan = load_plan_days(db, plan, today, today)
+    if todays_plan:
+        current_topic = next(filter(None, map(task_topic, todays_plan[0]["tasks"])), None)
+        if current_topic in topics:
+            shift = topics.index(current_topic)
+            topics = topics[shift:] + topics[:shift]
+
     # ---------- Regenerate Plan ----------
     new_plan = generate_structured_plan(
         exam_date=plan.exam_date,
@@ -70,26 +80,30 @@ def adapt_study_plan(db: Session, plan_id: int):
         level=plan.level
     )
 
+    # ---------- Apply Only The Diff ----------
+    # Past days are history; of the rest, only days whose tasks or hours
+    # changed are rewritten and have their progress reset
+    ensure_plan_days(db, plan)
+    changed_days, removed_dates = diff_plan_days(db, plan, new_plan, new_hours, start=today)
+    changed_dates = [date.fromisoformat(day["date"]) for day in changed_days]
+
+    if changed_dates or removed_dates:
+        delete_plan_days(db, plan_id, dates=changed_dates + removed_dates)
+    insert_plan_days(db, plan_id, changed_days, new_hours)
+
+    if removed_dates:
+        db.query(PlanProgress).filter(
+            PlanProgress.study_plan_id == plan_id,
+            PlanProgress.date.in_(removed_dates)
+        ).delete(synchronize_session=False)
+
+    reset_progress(db, plan_id, changed_dates)
+
     # ---------- Update Plan ----------
     plan.study_hours_per_day = new_hours
-    plan.plan_content = json.dumps(new_plan)
     plan.status = "adjusted"
 
-    # ---------- Reset Future Progress ----------
-    db.query(PlanProgress).filter(
-        PlanProgress.study_plan_id == plan_id,
-        PlanProgress.date >= date.today()
-    ).delete()
-
-    for day in new_plan:
-        progress = PlanProgress(
-            study_plan_id=plan_id,
-            date=day["date"],
-            completed=False,
-            completion_percentage=0,
-            notes=None
-        )
-        db.add(progress)
+    refresh_plan_stats(db, plan_id)
 
     db.commit()
     db.refresh(plan)
@@ -97,5 +111,7 @@ def adapt_study_plan(db: Session, plan_id: int):
     return {
         "message": "Plan adapted successfully",
         "risk_index": risk_index,
-        "new_study_hours_per_day": new_hours
+        "new_study_hours_per_day": new_hours,
+        "days_changed": len(changed_days),
+        "days_removed": len(removed_dates)
     }
\ No newline at end of file
@@ -1,22 +1,30 @@
-import os
 import json
+import os
 from datetime import date, timedelta
 from dotenv import load_dotenv
-from openai import OpenAI
 from sqlalchemy.orm import Session
 
 from app.models.study_plan import StudyPlan
 from app.models.plan_progress import PlanProgress
 from app.services.analytics_service import calculate_plan_analytics
+from app.services.plan_stats_service import refresh_plan_stats
+from app.services.plan_store import ensure_plan_days, load_plan_days, plan_topics, replace_plan_days
+from app.services.prompt_builder import build_prompt
 from app.services.ai_service import calculate_risk_index
+from app.services.llm_gateway import llm_gateway
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
-def build_partial_adaptive_prompt(plan, analytics, risk_index, next_7_days):
+ADAPT_MODEL = "gpt-4o-mini"
+ADAPT_TEMPERATURE = 0.2
+ADAPT_SYSTEM_PROMPT = "You are a strict academic restructuring engine."
+ADAPT_MAX_TOKENS = int(os.getenv("ADAPT_MAX_TOKENS", "1500"))
+
 
-    return f"""
+def build_partial_adaptive_prompt(plan, analytics, risk_index, next_7_days, topics=()):
+
+    head = f"""
 You are Planora Professional Adaptive Engine.
 
 STRICT RULES:
@@ -28,12 +36,7 @@ STRICT RULES:
 - Do NOT invent new subjects.
 
 FORMAT:
-[
-  {{
-    "date": "YYYY-MM-DD",
-    "tasks": ["task1", "task2"]
-  }}
-]
+[{{"date": "YYYY-MM-DD", "tasks": ["task1", "task2"]}}]
 
 ========================
 
@@ -47,11 +50,21 @@ Completion Rate: {analytics["completion_rate"]}
 Missed Days: {analytics["missed_days"]}
 Consistency Score: {analytics["consistency_score"]}
 Risk Index: {risk_index}
+"""
 
-Restructure ONLY these upcoming 7 days:
+    # One compact JSON object per day; the days themselves are never trimmed
+    days = [json.dumps(day, separators=(",", ":")) for day in next_7_days]
 
-{json.dumps(next_7_days, indent=2)}
-"""
+    return build_prompt(
+        "adapt",
+        head,
+        [
+            ("Plan topics (use only these)", list(topics), True),
+            ("Restructure ONLY these upcoming 7 days", days, False)
+        ],
+        system=ADAPT_SYSTEM_PROMPT,
+        model=ADAPT_MODEL
+    )
 
 
 def adapt_study_plan_with_ai(db: Session, plan_id: int):
@@ -66,40 +79,27 @@ def adapt_study_plan_with_ai(db: Session, plan_id: int):
 
     risk_index = calculate_risk_index(analytics)
 
-    plan_content = plan.plan_content
-    if isinstance(plan_content, str):
-        plan_content = json.loads(plan_content)
-
     today = date.today()
+    window_end = today + timedelta(days=6)
 
-    past_days = []
-    next_7_days = []
-    future_days = []
-
-    for day in plan_content:
-        day_date = date.fromisoformat(day["date"])
-
-        if day_date < today:
-            past_days.append(day)
-        elif today <= day_date < today + timedelta(days=7):
-            next_7_days.append(day)
-        else:
-            future_days.append(day)
+    # Only the 7-day window is read and rewritten
+    next_7_days = load_plan_days(db, plan, today, window_end)
 
     if not next_7_days:
         return {"message": "No upcoming days to adapt"}
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a strict academic restructuring engine."},
-                {"role": "user", "content": build_partial_adaptive_prompt(plan, analytics, risk_index, next_7_days)}
-            ],
-            temperature=0.2
-        )
+        prompt = build_partial_adaptive_prompt(plan, analytics, risk_index, next_7_days, plan_topics(db, plan))
 
-        ai_output = response.choices[0].message.content.strip()
+        ai_output = llm_gateway.chat(
+            ADAPT_MODEL,
+            [
+                {"role": "system", "content": ADAPT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            ADAPT_TEMPERATURE,
+            ADAPT_MAX_TOKENS
+        ).strip()
 
         # Clean markdown if present
         ai_output = ai_output.replace("```json", "").replace("```", "").strip()
@@ -109,10 +109,15 @@ def adapt_study_plan_with_ai(db: Session, plan_id: int):
         if not isinstance(new_7_days, list):
             return {"error": "Invalid AI response format"}
 
-        # Merge plan
-        updated_plan = past_days + new_7_days + future_days
+        # Dates outside the window would collide with untouched days
+        new_7_days = [
+            day for day in new_7_days
+            if today <= date.fromisoformat(day["date"]) <= window_end
+        ]
 
-        plan.plan_content = json.dumps(updated_plan)
+        # Rewrite just the window's rows
+        ensure_plan_days(db, plan)
+        replace_plan_days(db, plan_id, new_7_days, plan.study_hours_per_day, start=today, end=window_end)
         plan.status = "ai_adjusted_partial"
 
         # Reset only upcoming 7 days progress
@@ -132,6 +137,8 @@ def adapt_study_plan_with_ai(db: Session, plan_id: int):
             )
             db.add(progress)
 
+        refresh_plan_stats(db, plan_id)
+
         db.commit()
         db.refresh(plan)
 
@@ -0,0 +1,30 @@
+import os
+
+from app.services.ai_adaptive_engine import adapt_study_plan_with_ai
+from app.services.ai_service import generate_ai_feedback
+from app.services.job_queue import JobQueue
+from app.services.llm_cache import invalidate_plan
+from app.services.providers import data_path
+
+# Number of AI jobs (and so LLM calls) running at once
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "4"))
+AI_JOB_DB_PATH = os.getenv("AI_JOB_DB_PATH", data_path("ai_jobs.sqlite3"))
+
+AI_FEEDBACK = "ai_feedback"
+AI_ADAPT = "ai_adapt"
+
+
+def run_ai_adapt(db, plan_id: int):
+    result = adapt_study_plan_with_ai(db, plan_id)
+    invalidate_plan(plan_id)
+    return result
+
+
+ai_job_queue = JobQueue(
+    AI_JOB_DB_PATH,
+    AI_JOB_WORKERS,
+    handlers={
+        AI_FEEDBACK: generate_ai_feedback,
+        AI_ADAPT: run_ai_adapt
+    }
+)
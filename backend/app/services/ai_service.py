@@ -1,16 +1,23 @@
+from datetime import date, timedelta
 import os
-import json
 from dotenv import load_dotenv
-from openai import OpenAI
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.models.study_plan import StudyPlan
 from app.services.analytics_service import calculate_plan_analytics
+from app.services.plan_store import load_plan_days, plan_outline
+from app.services.prompt_builder import PROMPT_RECENT_DAYS, build_prompt, day_lines, outline_lines
+from app.services.llm_cache import get_cached, make_key, plan_tag, store
+from app.services.llm_gateway import llm_gateway
 
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+FEEDBACK_MODEL = "gpt-4o-mini"
+FEEDBACK_TEMPERATURE = 0.3  # Lower = less hallucination
+FEEDBACK_SYSTEM_PROMPT = "You are a strict but intelligent academic performance analyst."
+FEEDBACK_MAX_TOKENS = int(os.getenv("FEEDBACK_MAX_TOKENS", "700"))
 
 
 def calculate_risk_index(analytics: dict) -> float:
@@ -28,12 +35,14 @@ def calculate_risk_index(analytics: dict) -> float:
     return round(max(0, min(100, score)), 2)
 
 
-def build_ai_context(plan: StudyPlan, analytics: dict, risk_index: float) -> str:
+def build_ai_context(plan: StudyPlan, analytics: dict, risk_index: float, outline: dict, recent_days: list) -> str:
     """
     Build structured intelligence context for AI.
+    The schedule is summarized (topic coverage, days around today) and
+    the prompt is held to the "feedback" token budget.
     """
 
-    return f"""
+    head = f"""
 You are Planora's Academic Intelligence Engine.
 
 IMPORTANT RULES:
@@ -58,9 +67,11 @@ PERFORMANCE ANALYTICS:
 - Consistency Score: {analytics["consistency_score"]}
 - Plan Risk Index: {risk_index}/100
 
-PLAN STRUCTURE (JSON):
-{json.dumps(plan.plan_content, indent=2)}
+PLAN STRUCTURE:
+- {outline["days"]} days, {outline["tasks"]} tasks, {outline["first"]} to {outline["last"]}
+"""
 
+    tail = """
 ============================
 
 Generate response in this structured format:
@@ -73,11 +84,24 @@ Generate response in this structured format:
 
 Keep response concise but intelligent.
 """
-    
 
-def generate_ai_feedback(db: Session, plan_id: int):
+    return build_prompt(
+        "feedback",
+        head,
+        [
+            ("TOPIC COVERAGE (tasks, first..last date)", outline_lines(outline), True),
+            ("SCHEDULE AROUND TODAY", day_lines(recent_days), True)
+        ],
+        tail,
+        system=FEEDBACK_SYSTEM_PROMPT,
+        model=FEEDBACK_MODEL
+    )
+
+
+def prepare_ai_feedback(db: Session, plan_id: int):
     """
-    Generate intelligent AI feedback based on analytics + real plan data.
+    Load plan + analytics and build the feedback prompt.
+    Returns (context_prompt, risk_index), or an error dict.
     """
 
     plan = db.query(StudyPlan).filter(StudyPlan.id == plan_id).first()
@@ -92,30 +116,94 @@ def generate_ai_feedback(db: Session, plan_id: int):
 
     risk_index = calculate_risk_index(analytics)
 
-    context_prompt = build_ai_context(plan, analytics, risk_index)
+    today = date.today()
+    window = timedelta(days=PROMPT_RECENT_DAYS)
+
+    outline = plan_outline(db, plan)
+    recent_days = load_plan_days(db, plan, today - window, today + window)
+
+    return build_ai_context(plan, analytics, risk_index, outline, recent_days), risk_index
+
+
+def feedback_messages(context_prompt: str):
+    return [
+        {
+            "role": "system",
+            "content": FEEDBACK_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": context_prompt
+        }
+    ]
+
+
+def generate_ai_feedback(db: Session, plan_id: int):
+    """
+    Generate intelligent AI feedback based on analytics + real plan data.
+    Identical prompts are answered from the LLM response cache.
+    """
+
+    prepared = prepare_ai_feedback(db, plan_id)
+
+    if isinstance(prepared, dict):
+        return prepared
+
+    context_prompt, risk_index = prepared
+
+    return complete_ai_feedback(plan_id, context_prompt, risk_index)
+
+
+def complete_ai_feedback(plan_id: int, context_prompt: str, risk_index: float):
+    """
+    The LLM half of generate_ai_feedback; needs no database session.
+    """
+
+    messages = feedback_messages(context_prompt)
+
+    cache_key = make_key(FEEDBACK_MODEL, FEEDBACK_TEMPERATURE, messages, FEEDBACK_MAX_TOKENS)
+    cached = get_cached(cache_key)
+
+    if cached is not None:
+        return {
+            "ai_feedback": cached,
+            "risk_index": risk_index
+        }
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a strict but intelligent academic performance analyst."
-                },
-                {
-                    "role": "user",
-                    "content": context_prompt
-                }
-            ],
-            temperature=0.3,  # Lower = less hallucination
-        )
+        feedback = llm_gateway.chat(FEEDBACK_MODEL, messages, FEEDBACK_TEMPERATURE, FEEDBACK_MAX_TOKENS)
+        store(cache_key, feedback, tags=[plan_tag(plan_id)])
 
         return {
-            "ai_feedback": response.choices[0].message.content,
+            "ai_feedback": feedback,
             "risk_index": risk_index
         }
 
     except Exception as e:
         return {
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+async def stream_ai_feedback(plan_id: int, context_prompt: str):
+    """
+    Async generator yielding feedback tokens as they arrive.
+    A cache hit is replayed as a single token.
+    """
+
+    messages = feedback_messages(context_prompt)
+
+    cache_key = make_key(FEEDBACK_MODEL, FEEDBACK_TEMPERATURE, messages, FEEDBACK_MAX_TOKENS)
+    cached = await run_in_threadpool(get_cached, cache_key)
+
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+
+    async for token in llm_gateway.stream_chat(FEEDBACK_MODEL, messages, FEEDBACK_TEMPERATURE, FEEDBACK_MAX_TOKENS):
+        parts.append(token)
+        yield token
+
+    await run_in_threadpool(store, cache_key, "".join(parts), tags=[plan_tag(plan_id)])
@@ -1,24 +1,25 @@
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 from app.models.plan_progress import PlanProgress
+from app.models.plan_stats import PlanStats
 from app.models.study_plan import StudyPlan
 from datetime import date
 
-def calculate_plan_analytics(db: Session, plan_id: int):
-    progress_entries = db.query(PlanProgress).filter(
-        PlanProgress.study_plan_id == plan_id
-    ).all()
 
-    if not progress_entries:
-        return None
+def progress_aggregate_columns():
+    not_completed = func.coalesce(PlanProgress.completed, False) == False  # noqa: E712
 
-    total_days = len(progress_entries)
-    completed_days = sum(1 for p in progress_entries if p.completed)
-    missed_days = sum(1 for p in progress_entries if not p.completed and p.date < date.today())
-
-    average_percentage = (
-        sum(p.completion_percentage for p in progress_entries) // total_days
+    return (
+        func.count(PlanProgress.id).label("total_days"),
+        func.coalesce(func.sum(case((PlanProgress.completed == True, 1), else_=0)), 0).label("completed_days"),  # noqa: E712
+        func.coalesce(func.sum(case((not_completed & (PlanProgress.date < date.today()), 1), else_=0)), 0).label("missed_days"),
+        func.coalesce(func.sum(PlanProgress.completion_percentage), 0).label("percentage_sum"),
     )
 
+
+def _build_analytics(total_days: int, completed_days: int, missed_days: int, percentage_sum: int, last_activity_date=None):
+    average_percentage = int(percentage_sum) // total_days
+
     completion_rate = (completed_days / total_days) * 100
 
     # Basic consistency score logic
@@ -26,12 +27,95 @@ def calculate_plan_analytics(db: Session, plan_id: int):
 
     return {
         "total_days": total_days,
-        "completed_days": completed_days,
+        "completed_days": int(completed_days),
         "completion_rate": round(completion_rate, 2),
         "average_percentage": average_percentage,
-        "missed_days": missed_days,
-        "consistency_score": consistency_score
+        "missed_days": int(missed_days),
+        "consistency_score": consistency_score,
+        # Last progress update; unknown for plans without a plan_stats row
+        "last_activity_date": last_activity_date
     }
+
+
+def _missed_days_query(db: Session):
+    # Range scan on uq_plan_progress_plan_date, the only date-dependent part
+    return db.query(PlanProgress.study_plan_id, func.count(PlanProgress.id)).filter(
+        PlanProgress.date < date.today(),
+        func.coalesce(PlanProgress.completed, False) == False  # noqa: E712
+    )
+
+
+def calculate_plan_analytics(db: Session, plan_id: int):
+    stats = db.get(PlanStats, plan_id)
+
+    if stats is None:
+        # Plans created before plan_stats existed: aggregate the progress rows
+        row = db.query(*progress_aggregate_columns()).filter(
+            PlanProgress.study_plan_id == plan_id
+        ).one()
+
+        if not row.total_days:
+            return None
+
+        return _build_analytics(row.total_days, row.completed_days, row.missed_days, row.percentage_sum)
+
+    if not stats.total_days:
+        return None
+
+    missed = _missed_days_query(db).filter(
+        PlanProgress.study_plan_id == plan_id
+    ).group_by(PlanProgress.study_plan_id).first()
+
+    return _build_analytics(
+        stats.total_days,
+        stats.completed_days,
+        missed[1] if missed else 0,
+        stats.percentage_sum,
+        stats.last_activity_date
+    )
+
+
+def calculate_plans_analytics(db: Session, plan_ids: list):
+    """
+    Analytics for many plans in a fixed number of queries.
+    Returns {plan_id: analytics}; plans without progress rows are omitted.
+    """
+
+    if not plan_ids:
+        return {}
+
+    stats = {
+        s.study_plan_id: s
+        for s in db.query(PlanStats).filter(PlanStats.study_plan_id.in_(plan_ids)).all()
+    }
+
+    missed = dict(_missed_days_query(db).filter(
+        PlanProgress.study_plan_id.in_(list(stats))
+    ).group_by(PlanProgress.study_plan_id).all()) if stats else {}
+
+    results = {
+        plan_id: _build_analytics(
+            s.total_days, s.completed_days, missed.get(plan_id, 0), s.percentage_sum, s.last_activity_date
+        )
+        for plan_id, s in stats.items()
+        if s.total_days
+    }
+
+    legacy_ids = [plan_id for plan_id in plan_ids if plan_id not in stats]
+
+    if legacy_ids:
+        rows = db.query(PlanProgress.study_plan_id, *progress_aggregate_columns()).filter(
+            PlanProgress.study_plan_id.in_(legacy_ids)
+        ).group_by(PlanProgress.study_plan_id).all()
+
+        for row in rows:
+            results[row.study_plan_id] = _build_analytics(
+                row.total_days, row.completed_days, row.missed_days, row.percentage_sum
+            )
+
+    return results
+
+
 def calculate_risk_index(analytics):
     score = 100
     
@@ -39,4 +123,4 @@ def calculate_risk_index(analytics):
     score -= analytics["consistency_score"] * 0.3
     score -= analytics["missed_days"] * 2
 
-    return max(0, min(100, score))
\ No newline at end of file
+    return max(0, min(100, score))
@@ -0,0 +1,254 @@
+from collections import Counter
+import hashlib
+import os
+import re
+import zlib
+
+import numpy as np
+
+from app.services.prompt_builder import count_tokens
+
+# Chunk size and overlap, in tokens. all-MiniLM-L6-v2 truncates input
+# at 256 word pieces, so chunks stay comfortably below that.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# Chunks whose estimated Jaccard similarity to an earlier chunk is at
+# least this are dropped as near-duplicates
+CHUNK_DEDUP_THRESHOLD = float(os.getenv("CHUNK_DEDUP_THRESHOLD", "0.85"))
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+SHINGLE_WORDS = 3
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_DIGITS = re.compile(r"\d+")
+_WORD = re.compile(r"\w+")
+
+# Header/footer candidates: the first and last few short lines of a page.
+# One is stripped only if it recurs on at least MARGIN_REPEAT_RATIO of
+# the pages, judged once the first MARGIN_SAMPLE_PAGES have been read.
+MARGIN_LINES = 2
+MARGIN_MAX_CHARS = 100
+MARGIN_REPEAT_RATIO = float(os.getenv("MARGIN_REPEAT_RATIO", "0.5"))
+MARGIN_SAMPLE_PAGES = int(os.getenv("MARGIN_SAMPLE_PAGES", "20"))
+
+
+def _margin_key(line: str) -> str:
+    # "Page 3 of 40" and "Page 4 of 40" are the same footer
+    return _DIGITS.sub("#", " ".join(line.lower().split()))
+
+
+def _margin_lines(lines):
+    # (index, key) for each header/footer candidate of a page
+    margin = set(range(MARGIN_LINES)) | set(range(len(lines) - MARGIN_LINES, len(lines)))
+    return [
+        (i, _margin_key(lines[i]))
+        for i in sorted(margin)
+        if 0 <= i < len(lines) and lines[i].strip() and len(lines[i]) <= MARGIN_MAX_CHARS
+    ]
+
+
+def strip_repeated_margins(pages):
+    """
+    Drop header and footer lines that recur on a large share of pages.
+    A heading that merely repeats on a few pages is kept. The first
+    MARGIN_SAMPLE_PAGES pages are buffered to judge the share.
+    """
+
+    pages_seen = 0
+    pages_with = Counter()  # margin key -> pages it appears on
+    sample = []
+
+    def strip(lines, candidates):
+        threshold = max(2, MARGIN_REPEAT_RATIO * pages_seen)
+        drop = {i for i, key in candidates if pages_with[key] >= threshold}
+        return "\n".join(line for i, line in enumerate(lines) if i not in drop)
+
+    for page in pages:
+        if not page:
+            if sample:
+                sample.append((None, None, page))
+            else:
+                yield page
+            continue
+
+        lines = page.split("\n")
+        candidates = _margin_lines(lines)
+        pages_seen += 1
+        pages_with.update({key for _, key in candidates})
+
+        if pages_seen < MARGIN_SAMPLE_PAGES:
+            sample.append((lines, candidates, page))
+            continue
+
+        for sample_lines, sample_candidates, sample_page in sample:
+            yield strip(sample_lines, sample_candidates) if sample_lines else sample_page
+        sample = []
+
+        yield strip(lines, candidates)
+
+    # Documents shorter than the sample
+    for sample_lines, sample_candidates, sample_page in sample:
+        yield strip(sample_lines, sample_candidates) if sample_lines else sample_page
+
+
+def _split_long(sentence: str, max_tokens: int):
+    # A "sentence" longer than a whole chunk (tables, run-on text) is cut by words
+    piece = []
+    size = 0
+
+    for word in sentence.split():
+        piece.append(word)
+        size += count_tokens(word)
+        if size >= max_tokens:
+            yield " ".join(piece)
+            piece = []
+            size = 0
+
+    if piece:
+        yield " ".join(piece)
+
+
+def iter_sentences(pages, max_tokens: int):
+    """
+    Yields (sentence, tokens, ends_paragraph) across all pages.
+    Single line breaks inside a paragraph are treated as spaces.
+    """
+
+    for page in pages:
+        if not page:
+            continue
+
+        for paragraph in _PARAGRAPH_BREAK.split(page):
+            text = " ".join(paragraph.split())
+            if not text:
+                continue
+
+            sentences = [
+                piece
+                for sentence in _SENTENCE_END.split(text)
+                for piece in (
+                    _split_long(sentence, max_tokens)
+                    if count_tokens(sentence) > max_tokens else [sentence]
+                )
+            ]
+
+            for i, sentence in enumerate(sentences):
+                yield sentence, count_tokens(sentence), i == len(sentences) - 1
+
+
+def iter_structured_chunks(pages, max_tokens: int = None, overlap_tokens: int = None):
+    """
+    Pack whole sentences into chunks of at most `max_tokens`, preferring
+    to end a chunk at a paragraph break once it is half full. A chunk cut
+    mid-paragraph starts the next one with up to `overlap_tokens` of its
+    trailing sentences.
+    """
+
+    max_tokens = max_tokens or CHUNK_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    current = []  # (sentence, tokens)
+    size = 0
+    fresh = False  # holds more than carried-over overlap
+
+    def overlap_tail():
+        tail = []
+        total = 0
+        for sentence, tokens in reversed(current):
+            if total + tokens > overlap_tokens:
+                break
+            tail.insert(0, (sentence, tokens))
+            total += tokens
+        return tail, total
+
+    for sentence, tokens, ends_paragraph in iter_sentences(strip_repeated_margins(pages), max_tokens):
+        if fresh and size + tokens > max_tokens:
+            yield " ".join(s for s, _ in current)
+            current, size = overlap_tail()
+            # The overlap must leave room for the sentence that overflowed
+            while current and size + tokens > max_tokens:
+                size -= current.pop(0)[1]
+
+        current.append((sentence, tokens))
+        size += tokens
+        fresh = True
+
+        if ends_paragraph and size >= max_tokens // 2:
+            yield " ".join(s for s, _ in current)
+            current, size, fresh = [], 0, False
+
+    if fresh:
+        yield " ".join(s for s, _ in current)
+
+
+class ChunkDeduplicator:
+    """
+    Drops exact duplicates (hash of normalized text) and near-duplicates
+    (MinHash signatures over word shingles, with LSH banding so each
+    chunk is only compared against likely matches).
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold: float = None, permutations: int = MINHASH_PERMUTATIONS, bands: int = MINHASH_BANDS):
+        self.threshold = CHUNK_DEDUP_THRESHOLD if threshold is None else threshold
+        self.bands = bands
+        self.rows = permutations // bands
+
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, 1 << 31, size=permutations, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=permutations, dtype=np.uint64)
+
+        self._exact = set()
+        self._buckets = {}  # (band, band signature) -> [signature index]
+        self._signatures = []
+
+        self.exact_skipped = 0
+        self.near_skipped = 0
+
+    @property
+    def skipped(self) -> int:
+        return self.exact_skipped + self.near_skipped
+
+    def _signature(self, words: list):
+        shingles = {
+            zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+            for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+        }
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashes = (np.outer(x, self._a) + self._b) % self._PRIME
+        return hashes.min(axis=0)
+
+    def is_duplicate(self, chunk: str) -> bool:
+        """
+        True if `chunk` duplicates one seen before; otherwise remembers it.
+        """
+
+        words = _WORD.findall(chunk.lower())
+
+        digest = hashlib.sha1(" ".join(words).encode("utf-8")).digest()
+        if digest in self._exact:
+            self.exact_skipped += 1
+            return True
+
+        signature = self._signature(words)
+        bands = [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+        candidates = {i for key in bands for i in self._buckets.get(key, ())}
+        for i in candidates:
+            if np.mean(self._signatures[i] == signature) >= self.threshold:
+                self.near_skipped += 1
+                return True
+
+        self._exact.add(digest)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for key in bands:
+            self._buckets.setdefault(key, []).append(index)
+
+        return False
@@ -0,0 +1,99 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from datetime import date
+
+from app.models.plan_progress import PlanProgress
+from app.models.plan_stats import PlanStats
+from app.models.study_plan import StudyPlan
+from app.models.user import User
+from app.services.plan_generator import generate_structured_plan
+from app.services.plan_store import insert_days_for_plans
+
+
+def _insert_plans(db: Session, rows: list):
+    """
+    Insert study_plans rows and return their ids in input order.
+    One RETURNING statement where the dialect can order an executemany's
+    RETURNING rows (PostgreSQL, SQLite, SQL Server); one INSERT per plan
+    elsewhere (MySQL/MariaDB).
+    """
+
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.execute(
+            insert(StudyPlan).returning(StudyPlan.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+
+    return [db.execute(insert(StudyPlan).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+def create_cohort_plans(db: Session, template, members: list):
+    """
+    Create one plan per member from a shared exam/topic template.
+    Each distinct (level, hours) schedule is generated once and reused;
+    plans, days, tasks, progress and stats are bulk-inserted in a single
+    transaction.
+    """
+
+    if not members:
+        return {"plans_created": 0, "schedules_generated": 0, "plan_ids": []}
+
+    user_ids = {m.user_id for m in members}
+    known = set(db.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    unknown = sorted(user_ids - known)
+
+    if unknown:
+        return {"error": f"Unknown user ids: {unknown}"}
+
+    # Same template topics for everyone, so level and hours decide the schedule
+    schedules = {}
+    for member in members:
+        key = (member.level.lower(), member.study_hours_per_day)
+        if key not in schedules:
+            schedules[key] = generate_structured_plan(
+                exam_date=template.exam_date,
+                study_hours_per_day=member.study_hours_per_day,
+                topics=template.topics,
+                level=member.level
+            )
+
+    plan_ids = _insert_plans(db, [
+        {
+            "user_id": member.user_id,
+            "exam_name": template.exam_name,
+            "subject": template.subject,
+            "exam_date": template.exam_date,
+            "study_hours_per_day": member.study_hours_per_day,
+            "level": member.level,
+            "status": "active"
+        }
+        for member in members
+    ])
+
+    member_schedules = [
+        (plan_id, schedules[(member.level.lower(), member.study_hours_per_day)], member.study_hours_per_day)
+        for plan_id, member in zip(plan_ids, members)
+    ]
+
+    insert_days_for_plans(db, member_schedules)
+
+    progress_rows = [
+        {"study_plan_id": plan_id, "date": date.fromisoformat(day["date"])}
+        for plan_id, days, _ in member_schedules
+        for day in days
+    ]
+    if progress_rows:
+        db.execute(insert(PlanProgress), progress_rows)
+
+    db.execute(insert(PlanStats), [
+        {"study_plan_id": plan_id, "total_days": len(days), "completed_days": 0, "percentage_sum": 0}
+        for plan_id, days, _ in member_schedules
+    ])
+
+    db.commit()
+
+    return {
+        "plans_created": len(plan_ids),
+        "schedules_generated": len(schedules),
+        "plan_ids": list(plan_ids)
+    }
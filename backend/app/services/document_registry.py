@@ -0,0 +1,313 @@
+from contextlib import contextmanager
+import numpy as np
+import os
+import time
+
+from app.services.sqlite_store import SQLiteStore
+from app.services.vector_store import (
+    VECTOR_STORE_DIR,
+    drop_namespace,
+    namespace_exists,
+    namespace_ids,
+    remove_embeddings,
+)
+
+VECTOR_REGISTRY_PATH = os.getenv("VECTOR_REGISTRY_PATH", os.path.join(VECTOR_STORE_DIR, "documents.sqlite3"))
+
+# Each process refreshes the heartbeat of the ingestions it runs this
+# often; an ingestion whose heartbeat is older than
+# DOCUMENT_STALE_SECONDS lost its worker and is rolled back
+DOCUMENT_HEARTBEAT_SECONDS = float(os.getenv("DOCUMENT_HEARTBEAT_SECONDS", "15"))
+DOCUMENT_STALE_SECONDS = float(os.getenv("DOCUMENT_STALE_SECONDS", "90"))
+
+
+class DocumentRegistry(SQLiteStore):
+    """
+    Uploaded documents by content hash: which namespace holds each one
+    and the chunk ids it was indexed under. A user uploading a file they
+    already have (under any name) is pointed at the existing copy.
+
+    Several worker processes can share the SQLite file. Each owns the
+    ingestions it claims and keeps their heartbeat fresh; chunk ids are
+    recorded as they are indexed so a dead worker's partial ingestion
+    can be removed by whichever process notices it (see maintain).
+
+    The ingestion jobs reporting on those uploads live here too, so any
+    worker can answer for a job another one is running.
+    """
+
+    COLUMNS = "id, user_id, namespace, filename, content_hash, status, chunk_ids, chunks, created_at"
+    JOB_FIELDS = (
+        "job_id", "user_id", "document_id", "namespace", "status", "pages_total", "pages_processed",
+        "chunks_added", "chunks_skipped", "chunks_replaced", "error", "created_at", "finished_at"
+    )
+    JOB_COLUMNS = ", ".join(JOB_FIELDS)
+
+    def __init__(self, path: str):
+        super().__init__(path, DOCUMENT_HEARTBEAT_SECONDS, "document")
+
+    def _create_schema(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+            "namespace TEXT NOT NULL, filename TEXT, content_hash TEXT NOT NULL, "
+            "status TEXT NOT NULL, chunk_ids BLOB, chunks INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, owner TEXT, heartbeat_at REAL, "
+            "UNIQUE (user_id, content_hash))"
+        )
+
+        self._add_missing_columns(conn, "documents", (("owner", "TEXT"), ("heartbeat_at", "REAL")))
+
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_namespace ON documents (namespace)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_status ON documents (status)")
+
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingestion_jobs ("
+            "job_id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, document_id INTEGER, "
+            "namespace TEXT NOT NULL, status TEXT NOT NULL, pages_total INTEGER, "
+            "pages_processed INTEGER NOT NULL DEFAULT 0, chunks_added INTEGER NOT NULL DEFAULT 0, "
+            "chunks_skipped INTEGER NOT NULL DEFAULT 0, chunks_replaced INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT, created_at REAL NOT NULL, finished_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_finished ON ingestion_jobs (finished_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_document ON ingestion_jobs (document_id)")
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+
+        return {
+            "id": row[0],
+            "user_id": row[1],
+            "namespace": row[2],
+            "filename": row[3],
+            "content_hash": row[4],
+            "status": row[5],
+            "chunk_ids": np.frombuffer(row[6], dtype="int64") if row[6] else np.zeros(0, dtype="int64"),
+            "chunks": row[7],
+            "created_at": row[8]
+        }
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Hold the registry's write lock, across threads and processes, for
+        the duration of the block. Claims wait until it is released.
+        """
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def claim(self, user_id: int, namespace: str, filename: str, content_hash: str):
+        """
+        Register an upload about to be ingested. Returns (document, created);
+        created is False when the user already has this content.
+        """
+
+        with self._lock:
+            now = time.time()
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO documents "
+                "(user_id, namespace, filename, content_hash, status, created_at, owner, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, 'ingesting', ?, ?, ?)",
+                (user_id, namespace, filename, content_hash, now, self.owner, now)
+            )
+            row = self._conn.execute(
+                f"SELECT {self.COLUMNS} FROM documents WHERE user_id = ? AND content_hash = ?",
+                (user_id, content_hash)
+            ).fetchone()
+
+        return self._row(row), cursor.rowcount == 1
+
+    def record_progress(self, document_id: int, chunk_ids):
+        """
+        Store the chunk ids indexed so far for an ingestion in progress.
+        """
+
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET chunk_ids = ?, chunks = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'ingesting'",
+                (chunk_ids.tobytes(), len(chunk_ids), time.time(), document_id)
+            )
+
+    def complete(self, document_id: int, chunk_ids) -> bool:
+        """
+        Mark an ingestion ready. False if its row is gone (it was reaped
+        as stale), in which case the caller should roll back.
+        """
+
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE documents SET status = 'ready', chunk_ids = ?, chunks = ? "
+                "WHERE id = ? AND status = 'ingesting'",
+                (chunk_ids.tobytes(), len(chunk_ids), document_id)
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET heartbeat_at = ? WHERE owner = ? AND status = 'ingesting'",
+                (time.time(), self.owner)
+            )
+
+    def maintain(self):
+        self.heartbeat()
+        reap_stale_documents()
+
+    def reap_stale(self):
+        """
+        Delete and return ingestions whose owner stopped heartbeating
+        (crashed or restarted). The caller removes their recorded chunks.
+        """
+
+        now = time.time()
+        with self.exclusive():
+            rows = self._conn.execute(
+                f"SELECT {self.COLUMNS} FROM documents WHERE status = 'ingesting' "
+                "AND COALESCE(heartbeat_at, created_at) < ?",
+                (now - DOCUMENT_STALE_SECONDS,)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(row[0],) for row in rows])
+            self._conn.executemany(
+                "UPDATE ingestion_jobs SET status = 'failed', error = 'Worker stopped responding', finished_at = ? "
+                "WHERE document_id = ? AND finished_at IS NULL",
+                [(now, row[0]) for row in rows]
+            )
+        return [self._row(row) for row in rows]
+
+    def delete(self, document_ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(i,) for i in document_ids])
+
+    def in_namespace(self, namespace: str):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self.COLUMNS} FROM documents WHERE namespace = ? ORDER BY id", (namespace,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def add_job(self, job: dict):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO ingestion_jobs ({self.JOB_COLUMNS}) VALUES ({', '.join('?' * len(self.JOB_FIELDS))})",
+                tuple(job[field] for field in self.JOB_FIELDS)
+            )
+
+    def update_job(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE ingestion_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def get_job(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.JOB_COLUMNS} FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return dict(zip(self.JOB_FIELDS, row))
+
+    def prune_jobs(self, finished_before: float, max_entries: int):
+        """
+        Delete finished jobs older than `finished_before`, then the oldest
+        finished ones until at most `max_entries` jobs are left. Queued
+        and running jobs are never deleted.
+        """
+
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM ingestion_jobs WHERE finished_at < ?", (finished_before,)
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM ingestion_jobs").fetchone()
+            if count > max_entries:
+                self._conn.execute(
+                    "DELETE FROM ingestion_jobs WHERE job_id IN ("
+                    "SELECT job_id FROM ingestion_jobs WHERE finished_at IS NOT NULL "
+                    "ORDER BY finished_at LIMIT ?)",
+                    (count - max_entries,)
+                )
+
+    def for_user(self, user_id: int):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self.COLUMNS} FROM documents WHERE user_id = ? ORDER BY id DESC", (user_id,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+
+document_registry = DocumentRegistry(VECTOR_REGISTRY_PATH)
+
+
+def reap_stale_documents() -> int:
+    """
+    Roll back ingestions abandoned by a dead worker: their registry rows
+    and whatever chunks they had indexed. Returns how many were reaped.
+    """
+
+    stale = document_registry.reap_stale()
+    for document in stale:
+        remove_embeddings(document["chunk_ids"], document["namespace"])
+    return len(stale)
+
+
+def replace_previous_versions(document: dict):
+    """
+    Called once `document` is indexed: remove whatever else its namespace
+    held, so a re-upload under the same name replaces the old version.
+    Returns the number of chunks removed.
+    """
+
+    namespace = document["namespace"]
+    others = [d for d in document_registry.in_namespace(namespace) if d["id"] != document["id"]]
+
+    if any(d["status"] == "ingesting" for d in others):
+        # Another version is still being indexed; only drop finished ones
+        stale = np.concatenate(
+            [np.zeros(0, dtype="int64")] + [d["chunk_ids"] for d in others if d["status"] == "ready"]
+        )
+    else:
+        # Also catches chunks indexed before the registry existed
+        stale = np.setdiff1d(namespace_ids(namespace), document["chunk_ids"])
+
+    document_registry.delete([d["id"] for d in others if d["status"] == "ready"])
+
+    return remove_embeddings(stale, namespace)
+
+
+def delete_document(namespace: str):
+    """
+    Remove a document's namespace: vectors, chunk texts and registry rows.
+    Returns None if there is nothing to delete, or an error dict while
+    a version of it is still being ingested.
+    """
+
+    # Held until the files are gone, so a claim (an upload or replace
+    # starting) can't slip in between the check and the drop
+    with document_registry.exclusive():
+        documents = document_registry.in_namespace(namespace)
+
+        if not documents and not namespace_exists(namespace):
+            return None
+
+        if any(d["status"] == "ingesting" for d in documents):
+            return {"error": "Document is still being ingested"}
+
+        chunks_removed = len(namespace_ids(namespace))
+
+        drop_namespace(namespace)
+        document_registry.delete([d["id"] for d in documents])
+
+    return {"chunks_removed": chunks_removed}
@@ -1,8 +1,193 @@
-from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+import hashlib
 import numpy as np
+import os
+import sqlite3
+import threading
+
+from app.services.providers import EMBEDDING_MODEL_NAME as MODEL_NAME, data_path, get_embedding_model
+
+EMBEDDING_DIMENSION = 384  # all-MiniLM-L6-v2 output size
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", data_path("embedding_cache.sqlite3"))
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: a bounded in-memory LRU in front
+    of a SQLite table of raw float32 vectors keyed by text hash. The
+    table is opened on first use, not at import.
+    """
+
+    def __init__(self, path: str, max_entries: int, dimension: int):
+        self.max_entries = max_entries
+        self.dimension = dimension
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._conn = None
+
+    def _connection(self):
+        # Caller holds _lock
+        if self._conn is None and self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+        return self._conn
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(f"{MODEL_NAME}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, vector):
+        # Shared by every lookup: in-place edits by a caller must fail
+        # loudly rather than corrupt the cache
+        vector.setflags(write=False)
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for every key found in memory or on disk.
+        """
+
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self._stats["memory_hits"] += 1
+                else:
+                    missing.append(key)
+
+            conn = self._connection() if missing else None
+            if conn is not None:
+                unique = list(dict.fromkeys(missing))
+                for start in range(0, len(unique), 500):
+                    batch = unique[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype="float32")
+                        found[key] = vector
+                        self._remember(key, vector)
+
+            for key in missing:
+                if key in found:
+                    self._stats["disk_hits"] += 1
+                else:
+                    self._stats["misses"] += 1
+
+        return found
+
+    def put_many(self, items):
+        """
+        Cache (key, vector) pairs. Vectors are copied, so callers keep
+        ownership of (and can still modify) the arrays they pass in.
+        """
+
+        items = [(key, np.array(vector, dtype="float32")) for key, vector in items]
+
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+
+            conn = self._connection() if items else None
+            if conn is not None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in items]
+                )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            memory_entries = len(self._memory)
+
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        disk_bytes = 0
+        if self.path:
+            disk_bytes = sum(
+                os.path.getsize(p)
+                for p in (self.path, f"{self.path}-wal")
+                if os.path.exists(p)
+            )
+
+        return {
+            **stats,
+            "hit_rate": round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "memory_bytes": memory_entries * (self.dimension * 4 + 32),
+            "disk_bytes": disk_bytes
+        }
+
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_DIMENSION)
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def generate_embedding(text: str):
-    embedding = model.encode(text)
-    return np.array(embedding).astype("float32")
\ No newline at end of file
+    key = EmbeddingCache.key(text)
+
+    cached = embedding_cache.get_many([key]).get(key)
+    if cached is not None:
+        return cached.copy()
+
+    embedding = np.array(get_embedding_model().encode(text, normalize_embeddings=True)).astype("float32")
+    embedding_cache.put_many([(key, embedding)])
+
+    return embedding
+
+
+def generate_embeddings(texts: list, batch_size: int = None):
+    """
+    Embed many texts at once.
+    Returns a (len(texts), dim) float32 array of L2-normalized vectors.
+    Cached texts are copied in; only misses go through the model.
+    """
+
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
+    embeddings = np.empty((len(texts), EMBEDDING_DIMENSION), dtype="float32")
+
+    keys = [EmbeddingCache.key(text) for text in texts]
+    cached = embedding_cache.get_many(keys)
+
+    # Encode each distinct missing text once, remembering every row it fills
+    pending = OrderedDict()
+    for row, key in enumerate(keys):
+        if key in cached:
+            embeddings[row] = cached[key]
+        else:
+            pending.setdefault(key, []).append(row)
+
+    pending_keys = list(pending)
+
+    for start in range(0, len(pending_keys), batch_size):
+        batch_keys = pending_keys[start:start + batch_size]
+        encoded = get_embedding_model().encode(
+            [texts[pending[key][0]] for key in batch_keys],
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).astype("float32", copy=False)
+
+        for key, vector in zip(batch_keys, encoded):
+            embeddings[pending[key]] = vector
+
+        embedding_cache.put_many(list(zip(batch_keys, encoded)))
+
+    return embeddings
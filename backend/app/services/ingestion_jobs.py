@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import uuid
+
+from app.services.document_registry import document_registry, reap_stale_documents, replace_previous_versions
+from app.services.rag_service import process_pdf
+from app.services.vector_store import remove_embeddings
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Job state is kept in the document registry so every worker sees it.
+# Finished jobs stay visible this long; beyond INGEST_JOB_MAX_ENTRIES the
+# oldest finished jobs go first
+INGEST_JOB_TTL_SECONDS = float(os.getenv("INGEST_JOB_TTL_SECONDS", "3600"))
+INGEST_JOB_MAX_ENTRIES = int(os.getenv("INGEST_JOB_MAX_ENTRIES", "1000"))
+
+FINISHED_STATUSES = ("completed", "failed", "skipped")
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+def _update(job_id: str, **fields):
+    if fields.get("status") in FINISHED_STATUSES:
+        fields["finished_at"] = time.time()
+
+    document_registry.update_job(job_id, **fields)
+
+
+def _run(job_id: str, file_path: str, document: dict):
+    _update(job_id, status="running")
+
+    namespace = document["namespace"]
+    chunk_ids = []
+    recorded = 0
+
+    def on_progress(pages_total, pages_processed, chunks_added, chunks_skipped):
+        nonlocal recorded
+
+        _update(
+            job_id,
+            pages_total=pages_total,
+            pages_processed=pages_processed,
+            chunks_added=chunks_added,
+            chunks_skipped=chunks_skipped
+        )
+
+        # So another process can remove these chunks if this one dies
+        if len(chunk_ids) != recorded:
+            document_registry.record_progress(document["id"], chunk_ids)
+            recorded = len(chunk_ids)
+
+    try:
+        process_pdf(file_path, namespace, on_progress=on_progress, chunk_ids=chunk_ids)
+
+        if not document_registry.complete(document["id"], chunk_ids):
+            raise RuntimeError("Ingestion was abandoned as stale before it finished")
+    except Exception as e:
+        # Leave nothing half-indexed behind; the upload can simply be retried
+        remove_embeddings(chunk_ids, namespace)
+        document_registry.delete([document["id"]])
+        _update(job_id, status="failed", error=str(e))
+        return
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    # The new version is indexed and registered; failing to clear the old
+    # one must not roll it back (a later replace sweeps what is left)
+    document["chunk_ids"] = chunk_ids
+    try:
+        chunks_replaced = replace_previous_versions(document)
+    except Exception as e:
+        _update(job_id, status="completed", error=f"Previous version not removed: {e}")
+        return
+
+    _update(job_id, status="completed", chunks_replaced=chunks_replaced)
+
+
+def submit_ingestion(file_path: str, namespace: str, user_id: int, filename: str, content_hash: str) -> dict:
+    """
+    Queue a PDF for indexing. If the user already has a file with the
+    same content, nothing is queued: the job is "skipped" and its
+    namespace is the one already holding that content.
+    """
+
+    job_id = uuid.uuid4().hex
+
+    # A re-upload after a crash must not be pointed at the dead attempt
+    reap_stale_documents()
+
+    document, created = document_registry.claim(user_id, namespace, filename, content_hash)
+
+    now = time.time()
+
+    # Leaves room for the job being added
+    document_registry.prune_jobs(now - INGEST_JOB_TTL_SECONDS, INGEST_JOB_MAX_ENTRIES - 1)
+    document_registry.add_job({
+        "job_id": job_id,
+        "user_id": user_id,
+        "document_id": document["id"] if created else None,
+        "namespace": document["namespace"],
+        "status": "queued" if created else "skipped",
+        "pages_total": None,
+        "pages_processed": 0,
+        "chunks_added": 0,
+        "chunks_skipped": 0,
+        "chunks_replaced": 0,
+        "error": None,
+        "created_at": now,
+        "finished_at": None if created else now
+    })
+
+    if created:
+        _executor.submit(_run, job_id, file_path, document)
+    elif os.path.exists(file_path):
+        os.remove(file_path)
+
+    return get_job(job_id)
+
+
+def get_job(job_id: str):
+    return document_registry.get_job(job_id)
@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+import uuid
+
+from app.database import SessionLocal
+from app.services.sqlite_store import SQLiteStore
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Each process refreshes its active jobs' heartbeat this often; a job
+# whose heartbeat is older than JOB_STALE_SECONDS lost its worker
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "90"))
+
+# Finished jobs (and their results) are deleted after this long
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400)))
+
+
+class JobQueue(SQLiteStore):
+    """
+    In-process job queue: a bounded worker pool, with job state kept in
+    SQLite so status and results survive the request that queued them.
+
+    `handlers` maps a job kind to fn(db, plan_id) -> dict; a dict with an
+    "error" key marks the job failed. At most one job per (kind, plan)
+    is queued or running at a time; duplicates get the existing job.
+
+    Jobs are owned by the process that queued them. A job whose owner
+    has stopped heartbeating is marked failed by whichever process
+    notices first; finished jobs are kept for JOB_RETENTION_SECONDS.
+    """
+
+    def __init__(self, path: str, workers: int, handlers: dict):
+        super().__init__(path, JOB_HEARTBEAT_SECONDS, "ai-job")
+        self.handlers = handlers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-job")
+
+    def _create_schema(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, plan_id INTEGER NOT NULL, "
+            "user_id INTEGER, status TEXT NOT NULL, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "owner TEXT, heartbeat_at REAL)"
+        )
+
+        self._add_missing_columns(conn, "jobs", (("owner", "TEXT"), ("heartbeat_at", "REAL")))
+
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_kind_plan_status ON jobs (kind, plan_id, status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_updated ON jobs (status, updated_at)")
+
+    def maintain(self):
+        """
+        Refresh this process's heartbeats, fail jobs whose owner stopped
+        heartbeating (crashed or restarted), and delete finished jobs past
+        the retention period.
+        """
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN (?, ?)",
+                (now, self.owner, *ACTIVE_STATUSES)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', updated_at = ? "
+                "WHERE status IN (?, ?) "
+                "AND COALESCE(heartbeat_at, updated_at) < ?",
+                (now, *ACTIVE_STATUSES, now - JOB_STALE_SECONDS)
+            )
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ?",
+                (now - JOB_RETENTION_SECONDS,)
+            )
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id: str, kind: str, plan_id: int):
+        self._update(job_id, status="running")
+
+        db = SessionLocal()
+        try:
+            result = self.handlers[kind](db, plan_id)
+
+            if isinstance(result, dict) and "error" in result:
+                self._update(job_id, status="failed", error=str(result["error"]))
+            else:
+                self._update(job_id, status="completed", result=json.dumps(result, default=str))
+        except Exception as e:
+            db.rollback()
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            db.close()
+
+    def submit(self, kind: str, plan_id: int, user_id: int = None):
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND plan_id = ? AND status IN (?, ?) "
+                "AND COALESCE(heartbeat_at, updated_at) >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (kind, plan_id, *ACTIVE_STATUSES, time.time() - JOB_STALE_SECONDS)
+            ).fetchone()
+
+            if existing:
+                return self.get(existing[0], lock=False)
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, plan_id, user_id, status, created_at, updated_at, owner, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, plan_id, user_id, now, now, self.owner, now)
+            )
+
+        self._executor.submit(self._run, job_id, kind, plan_id)
+
+        return self.get(job_id)
+
+    def get(self, job_id: str, lock: bool = True):
+        def fetch():
+            return self._conn.execute(
+                "SELECT id, kind, plan_id, user_id, status, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+
+        if lock:
+            with self._lock:
+                row = fetch()
+        else:
+            row = fetch()
+
+        if row is None:
+            return None
+
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "plan_id": row[2],
+            "user_id": row[3],
+            "status": row[4],
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8]
+        }
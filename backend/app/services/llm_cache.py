@@ -0,0 +1,237 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.services.providers import data_path
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # memory | sqlite | off
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", data_path("llm_cache.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+
+def make_key(model: str, temperature: float, messages: list, max_tokens: int = None) -> str:
+    request = {"model": model, "temperature": temperature, "messages": messages}
+    # Only part of the key when set, so keys for unlimited calls are unchanged
+    if max_tokens:
+        request["max_tokens"] = max_tokens
+
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU with a TTL. Tags map to the keys stored under them
+    so related entries can be dropped together.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def _discard(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if entry[0] < time.time():
+                self._discard(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+
+            self._entries[key] = (time.time() + self.ttl_seconds, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache shared by every worker on the host.
+    LRU order is tracked with a last-access timestamp. The file is
+    opened on first use, not at import.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self):
+        # Caller holds _lock
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache_tags ("
+                "tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_tags_key ON llm_cache_tags (key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+            self._db = conn
+        return self._db
+
+    def _delete_keys(self, keys):
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(k,) for k in keys])
+        self._conn.executemany("DELETE FROM llm_cache_tags WHERE key = ?", [(k,) for k in keys])
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            if row[1] < now:
+                self._delete_keys([key])
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, tags=()):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, now + self.ttl_seconds, now)
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO llm_cache_tags (tag, key) VALUES (?, ?)",
+                    [(tag, key) for tag in tags]
+                )
+
+                overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    stale = self._conn.execute(
+                        "SELECT key FROM llm_cache ORDER BY last_access LIMIT ?", (overflow,)
+                    ).fetchall()
+                    self._delete_keys([k for (k,) in stale])
+
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Otherwise the connection stays inside the failed
+                # transaction and every later write fails on BEGIN
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = [k for (k,) in self._conn.execute(
+                "SELECT key FROM llm_cache_tags WHERE tag = ?", (tag,)
+            ).fetchall()]
+            self._delete_keys(keys)
+            return len(keys)
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def _create_backend():
+    if LLM_CACHE_BACKEND == "off":
+        return None
+    if LLM_CACHE_BACKEND == "sqlite":
+        return SQLiteCacheBackend(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+    return MemoryCacheBackend(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+
+
+backend = _create_backend()
+
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def plan_tag(plan_id: int) -> str:
+    return f"plan:{plan_id}"
+
+
+def get_cached(key: str):
+    if backend is None:
+        return None
+
+    value = backend.get(key)
+    _count("hits" if value is not None else "misses")
+    return value
+
+
+def store(key: str, value: str, tags=()):
+    if backend is not None and value:
+        backend.set(key, value, tags)
+
+
+def invalidate_plan(plan_id: int):
+    if backend is not None:
+        _count("invalidations", backend.invalidate_tag(plan_tag(plan_id)))
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+
+    lookups = stats["hits"] + stats["misses"]
+
+    return {
+        "backend": LLM_CACHE_BACKEND,
+        "entries": backend.size() if backend is not None else 0,
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+        "invalidations": stats["invalidations"]
+    }
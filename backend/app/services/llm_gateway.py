@@ -0,0 +1,357 @@
+from collections import deque
+from concurrent.futures import Future
+import asyncio
+import os
+import threading
+import time
+
+from app.services.llm_cache import make_key
+from app.services.providers import get_async_openai_client, get_openai_client
+
+# Concurrent OpenAI calls across the process, and per model
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+# Per-model overrides, e.g. "gpt-4o-mini=6,gpt-4o=2"
+LLM_MODEL_LIMITS = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("LLM_MODEL_LIMITS", "").split(",") if "=" in item
+    )
+}
+
+# Token bucket on request starts: sustained rate and burst size
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+
+
+def _limits(max_tokens: int = None):
+    # Leave the parameter out entirely rather than sending null
+    return {"max_tokens": max_tokens} if max_tokens else {}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() takes a token immediately, going
+    into debt if the bucket is empty, and returns how long the caller
+    must wait before using it, so blocking and async callers can share
+    one bucket and still be served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+
+            return max(0.0, -self._tokens / self.rate)
+
+    def take(self) -> float:
+        """
+        Block until a token is available; returns how long it slept.
+        """
+
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class SharedSemaphore:
+    """
+    Counting semaphore shared by threads and event loops, served in
+    arrival order. Blocking callers wait on an event; async callers
+    queue a future on their own loop, so a waiting coroutine holds no
+    thread. A released slot is handed straight to the next waiter.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._free = size
+        self._lock = threading.Lock()
+        self._waiters = deque()  # callables that take over a slot
+
+    def acquire(self):
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+
+            granted = threading.Event()
+            self._waiters.append(lambda: granted.set() or True)
+
+        granted.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+
+            granted = loop.create_future()
+
+            def hand_over():
+                try:
+                    loop.call_soon_threadsafe(deliver)
+                except RuntimeError:
+                    return False  # loop closed; try the next waiter
+                return True
+
+            def deliver():
+                if granted.cancelled():
+                    self.release()
+                else:
+                    granted.set_result(None)
+
+            self._waiters.append(hand_over)
+
+        try:
+            await granted
+        except BaseException:
+            with self._lock:
+                try:
+                    self._waiters.remove(hand_over)
+                    owned = False
+                except ValueError:
+                    # Handed over already; if the future was cancelled
+                    # first, deliver() gives the slot back instead
+                    owned = granted.done() and not granted.cancelled()
+            if owned:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft()():
+                    return
+
+            if self._free >= self.size:
+                raise ValueError("SharedSemaphore released too many times")
+            self._free += 1
+
+
+class LLMGateway:
+    """
+    The one path to the OpenAI chat API: a global and a per-model
+    concurrency limit, a token-bucket rate limit, and single-flight
+    coalescing so identical concurrent requests share one completion.
+
+    Blocking calls and streams draw on the same slots (SharedSemaphore)
+    and the same rate limit; a waiting stream never holds a thread.
+    """
+
+    def __init__(self, max_concurrency: int, model_concurrency: int, model_limits: dict, rate: float, burst: int):
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency
+        self.model_limits = model_limits
+        self._global = SharedSemaphore(max_concurrency)
+        self._models = {}
+        self._bucket = TokenBucket(rate, burst)
+        self._lock = threading.Lock()
+        self._inflight = {}  # single-flight key -> Future
+        self._stats = {
+            "requests": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "active": 0,
+            "waiting": 0,
+            "rate_limited": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0
+        }
+        self._per_model = {}
+
+    def _model_limit(self, model: str) -> int:
+        return self.model_limits.get(model, self.model_concurrency)
+
+    def _model_semaphore(self, model: str):
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = SharedSemaphore(self._model_limit(model))
+            return self._models[model]
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _admitted(self, model: str, waited: float):
+        with self._lock:
+            self._stats["waiting"] -= 1
+            self._stats["active"] += 1
+            self._stats["requests"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._per_model[model] = self._per_model.get(model, 0) + 1
+
+    def _admit(self, model: str):
+        """
+        Block until the call may start: rate limit first, then a per-model
+        and a global slot. The model slot comes first so callers queued
+        behind a saturated model don't hold global slots other models
+        could use. Pair every call with _release.
+        """
+
+        self._count("waiting")
+        start = time.monotonic()
+
+        if self._bucket.take() > 0:
+            self._count("rate_limited")
+
+        self._model_semaphore(model).acquire()
+        self._global.acquire()
+
+        self._admitted(model, time.monotonic() - start)
+
+    def _release(self, model: str):
+        self._global.release()
+        self._model_semaphore(model).release()
+        self._count("active", -1)
+
+    async def _admit_async(self, model: str):
+        """
+        _admit for the event loop. Pair every call with _release.
+        """
+
+        self._count("waiting")
+        start = time.monotonic()
+        model_slot = self._model_semaphore(model)
+
+        try:
+            delay = self._bucket.reserve()
+            if delay > 0:
+                self._count("rate_limited")
+                await asyncio.sleep(delay)
+
+            await model_slot.acquire_async()
+            try:
+                await self._global.acquire_async()
+            except BaseException:
+                model_slot.release()
+                raise
+        except BaseException:
+            self._count("waiting", -1)
+            raise
+
+        self._admitted(model, time.monotonic() - start)
+
+    def chat(self, model: str, messages: list, temperature: float, max_tokens: int = None) -> str:
+        """
+        Blocking chat completion; returns the message content.
+        Callers asking for an identical completion while one is in
+        flight wait for it instead of starting another.
+        """
+
+        key = make_key(model, temperature, messages, max_tokens)
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                leader = True
+            else:
+                self._stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            return pending.result()
+
+        try:
+            self._admit(model)
+            try:
+                response = get_openai_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    **_limits(max_tokens)
+                )
+            finally:
+                self._release(model)
+
+            content = response.choices[0].message.content
+            pending.set_result(content)
+            return content
+
+        except Exception as e:
+            self._count("errors")
+            pending.set_exception(e)
+            raise
+
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def stream_chat(self, model: str, messages: list, temperature: float, max_tokens: int = None):
+        """
+        Async generator of content tokens. Streams are limited like
+        chat() but not coalesced: each caller gets its own token stream.
+        """
+
+        await self._admit_async(model)
+
+        try:
+            stream = await get_async_openai_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                **_limits(max_tokens)
+            )
+
+            async for event in stream:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+
+        except Exception:
+            self._count("errors")
+            raise
+
+        finally:
+            self._release(model)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            per_model = dict(self._per_model)
+            inflight = len(self._inflight)
+
+        requests = stats["requests"]
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "model_concurrency": self.model_concurrency,
+            "model_limits": self.model_limits,
+            "requests_per_second": self._bucket.rate,
+            "burst": self._bucket.capacity,
+            "active": stats["active"],
+            "waiting": stats["waiting"],
+            "inflight_keys": inflight,
+            "requests": requests,
+            "requests_by_model": per_model,
+            "coalesced": stats["coalesced"],
+            "rate_limited": stats["rate_limited"],
+            "errors": stats["errors"],
+            "avg_wait_ms": round(stats["wait_seconds_total"] / requests * 1000, 2) if requests else 0.0,
+            "max_wait_ms": round(stats["wait_seconds_max"] * 1000, 2)
+        }
+
+
+llm_gateway = LLMGateway(
+    LLM_MAX_CONCURRENCY,
+    LLM_MODEL_CONCURRENCY,
+    LLM_MODEL_LIMITS,
+    LLM_REQUESTS_PER_SECOND,
+    LLM_BURST
+)
@@ -0,0 +1,82 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+from pypdf import PdfReader
+
+# Kept free of app imports: spawned workers import only this module
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# Page ranges submitted ahead of the consumer; bounds memory per document
+PDF_TASKS_IN_FLIGHT = int(os.getenv("PDF_TASKS_IN_FLIGHT", str(2 * PDF_EXTRACT_WORKERS)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int):
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _iter_page_range(file_path: str, start: int, end: int):
+    reader = PdfReader(file_path)
+    for i in range(start, end):
+        yield reader.pages[i].extract_text() or ""
+
+
+def iter_pdf_pages(file_path: str, page_count: int = None):
+    """
+    Yield page texts in order while later pages are still being
+    extracted by the process pool. At most PDF_TASKS_IN_FLIGHT page
+    ranges are queued or buffered at a time, so memory stays bounded
+    however long the document is.
+    """
+
+    if page_count is None:
+        page_count = count_pages(file_path)
+
+    if page_count <= PDF_PAGES_PER_TASK or PDF_EXTRACT_WORKERS <= 1:
+        yield from _iter_page_range(file_path, 0, page_count)
+        return
+
+    pool = _get_pool()
+    ranges = ((start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK))
+    in_flight = deque()
+
+    def submit_next():
+        page_range = next(ranges, None)
+        if page_range is not None:
+            in_flight.append(pool.submit(extract_page_range, file_path, *page_range))
+
+    try:
+        for _ in range(max(1, PDF_TASKS_IN_FLIGHT)):
+            submit_next()
+
+        while in_flight:
+            pages = in_flight.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        # The consumer stopped early (error or close); drop queued ranges
+        for future in in_flight:
+            future.cancel()
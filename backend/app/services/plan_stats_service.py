@@ -0,0 +1,178 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import date
+import argparse
+
+from app.models.plan_progress import PlanProgress
+from app.models.plan_stats import PlanStats
+from app.services.analytics_service import progress_aggregate_columns
+
+
+def _recompute(db: Session, plan_ids=None):
+    query = db.query(PlanProgress.study_plan_id, *progress_aggregate_columns())
+    if plan_ids is not None:
+        query = query.filter(PlanProgress.study_plan_id.in_(plan_ids))
+
+    return {
+        row.study_plan_id: {
+            "total_days": int(row.total_days),
+            "completed_days": int(row.completed_days),
+            "percentage_sum": int(row.percentage_sum)
+        }
+        for row in query.group_by(PlanProgress.study_plan_id).all()
+    }
+
+
+def init_plan_stats(db: Session, plan_id: int, total_days: int):
+    """
+    Stats row for a freshly created plan (nothing completed yet).
+    Joins the caller's transaction; does not commit.
+    """
+
+    db.add(PlanStats(
+        study_plan_id=plan_id,
+        total_days=total_days,
+        completed_days=0,
+        percentage_sum=0
+    ))
+
+
+def refresh_plan_stats(db: Session, plan_id: int):
+    """
+    Recompute one plan's stats from plan_progress after a bulk rewrite.
+    Joins the caller's transaction; does not commit.
+    """
+
+    db.flush()
+
+    totals = _recompute(db, [plan_id]).get(
+        plan_id, {"total_days": 0, "completed_days": 0, "percentage_sum": 0}
+    )
+
+    stats = db.get(PlanStats, plan_id)
+    if stats is None:
+        stats = PlanStats(study_plan_id=plan_id)
+        db.add(stats)
+
+    stats.total_days = totals["total_days"]
+    stats.completed_days = totals["completed_days"]
+    stats.percentage_sum = totals["percentage_sum"]
+
+
+def lock_progress(progress_id: int):
+    """
+    Select for one progress row that locks it until the transaction ends
+    and refreshes an already-loaded instance with the locked values.
+    """
+
+    return (
+        select(PlanProgress)
+        .where(PlanProgress.id == progress_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+
+def _apply_delta(db: Session, plan_id: int, completed_delta: int, percentage_delta: int) -> int:
+    return db.query(PlanStats).filter(PlanStats.study_plan_id == plan_id).update({
+        PlanStats.completed_days: PlanStats.completed_days + completed_delta,
+        PlanStats.percentage_sum: PlanStats.percentage_sum + percentage_delta,
+        PlanStats.last_activity_date: date.today()
+    }, synchronize_session=False)
+
+
+def apply_progress_change(db: Session, plan_id: int, old_completed, old_percentage, new_completed, new_percentage):
+    """
+    Apply the delta from a single progress update with one UPDATE.
+    Call it before the new values are written to the progress row. The
+    old values must come from that row locked for update (see
+    lock_progress), or concurrent updates to the same day would both
+    apply a delta from the same starting point.
+    Joins the caller's transaction; does not commit.
+    """
+
+    completed_delta = int(bool(new_completed)) - int(bool(old_completed))
+    percentage_delta = (new_percentage or 0) - (old_percentage or 0)
+
+    if _apply_delta(db, plan_id, completed_delta, percentage_delta):
+        return
+
+    # Plan from before plan_stats: build its row from plan_progress, which
+    # still holds the old values, then apply this update on top
+    refresh_plan_stats(db, plan_id)
+    db.flush()
+    _apply_delta(db, plan_id, completed_delta, percentage_delta)
+
+
+def check_plan_stats(db: Session, plan_ids=None):
+    """
+    Compare plan_stats against plan_progress.
+    Returns a list of {plan_id, expected, actual} for every mismatch.
+    """
+
+    expected = _recompute(db, plan_ids)
+
+    query = db.query(PlanStats)
+    if plan_ids is not None:
+        query = query.filter(PlanStats.study_plan_id.in_(plan_ids))
+    stored = {s.study_plan_id: s for s in query.all()}
+
+    mismatches = []
+
+    for plan_id in sorted(set(expected) | set(stored)):
+        want = expected.get(plan_id, {"total_days": 0, "completed_days": 0, "percentage_sum": 0})
+        row = stored.get(plan_id)
+        have = None if row is None else {
+            "total_days": row.total_days,
+            "completed_days": row.completed_days,
+            "percentage_sum": row.percentage_sum
+        }
+
+        if have != want:
+            mismatches.append({"plan_id": plan_id, "expected": want, "actual": have})
+
+    return mismatches
+
+
+def rebuild_plan_stats(db: Session, plan_ids=None):
+    """
+    Fix every mismatched stats row from plan_progress and commit.
+    Returns the number of rows rewritten.
+    """
+
+    mismatches = check_plan_stats(db, plan_ids)
+
+    for mismatch in mismatches:
+        stats = db.get(PlanStats, mismatch["plan_id"])
+        if stats is None:
+            stats = PlanStats(study_plan_id=mismatch["plan_id"])
+            db.add(stats)
+
+        stats.total_days = mismatch["expected"]["total_days"]
+        stats.completed_days = mismatch["expected"]["completed_days"]
+        stats.percentage_sum = mismatch["expected"]["percentage_sum"]
+
+    db.commit()
+
+    return len(mismatches)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    import app.models  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="Check or rebuild plan_stats from plan_progress")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.command == "check":
+            problems = check_plan_stats(session)
+            for problem in problems:
+                print(problem)
+            print(f"{len(problems)} mismatched plan(s)")
+        else:
+            print(f"rebuilt {rebuild_plan_stats(session)} plan(s)")
+    finally:
+        session.close()
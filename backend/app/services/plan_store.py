@@ -0,0 +1,411 @@
+from sqlalchemy import and_, delete, func, insert, inspect, select, text
+from sqlalchemy.orm import Session
+from datetime import date
+import argparse
+import json
+
+from app.models.plan_day import PlanDay, PlanTask
+from app.models.plan_progress import PlanProgress
+from app.models.study_plan import StudyPlan
+from app.services.prompt_builder import summarize_days
+
+PROGRESS_UNIQUE_INDEX = "uq_plan_progress_plan_date"
+LEGACY_PROGRESS_INDEX = "ix_plan_progress_plan_date"
+
+# Set once the unique (study_plan_id, date) index is seen; until then
+# reset_progress cannot rely on ON CONFLICT
+_progress_upsert_ready = False
+
+
+def task_topic(task: str):
+    return task.split(" - ")[0] if " - " in task else None
+
+
+def _legacy_days(plan: StudyPlan):
+    # Plans written before plan_days existed and not yet migrated
+    if not plan.plan_content:
+        return []
+    content = plan.plan_content
+    return json.loads(content) if isinstance(content, str) else content
+
+
+def _date_filter(query, start: date = None, end: date = None):
+    if start is not None:
+        query = query.where(PlanDay.date >= start)
+    if end is not None:
+        query = query.where(PlanDay.date <= end)
+    return query
+
+
+def insert_plan_days(db: Session, plan_id: int, days: list, hours: int):
+    """
+    Bulk-insert days ({"date", "tasks"} dicts, as produced by
+    generate_structured_plan) and their tasks. Does not commit.
+    """
+
+    insert_days_for_plans(db, [(plan_id, days, hours)])
+
+
+def insert_days_for_plans(db: Session, schedules: list):
+    """
+    insert_plan_days for many plans at once: `schedules` is a list of
+    (plan_id, days, hours). Three statements regardless of plan count.
+    """
+
+    schedules = [(plan_id, days, hours) for plan_id, days, hours in schedules if days]
+    if not schedules:
+        return
+
+    day_rows = [
+        {"study_plan_id": plan_id, "date": date.fromisoformat(str(day["date"])), "hours": hours}
+        for plan_id, days, hours in schedules
+        for day in days
+    ]
+    db.execute(insert(PlanDay), day_rows)
+
+    first = min(row["date"] for row in day_rows)
+    last = max(row["date"] for row in day_rows)
+    plan_ids = [plan_id for plan_id, _, _ in schedules]
+
+    day_ids = {
+        (plan_id, day_date): day_id
+        for plan_id, day_date, day_id in db.execute(
+            _date_filter(
+                select(PlanDay.study_plan_id, PlanDay.date, PlanDay.id).where(PlanDay.study_plan_id.in_(plan_ids)),
+                first,
+                last
+            )
+        ).all()
+    }
+
+    task_rows = [
+        {
+            "plan_day_id": day_ids[(plan_id, date.fromisoformat(str(day["date"])))],
+            "position": position,
+            "topic": task_topic(task),
+            "description": task
+        }
+        for plan_id, days, _ in schedules
+        for day in days
+        for position, task in enumerate(day["tasks"])
+    ]
+
+    if task_rows:
+        db.execute(insert(PlanTask), task_rows)
+
+
+def delete_plan_days(db: Session, plan_id: int, start: date = None, end: date = None, dates: list = None):
+    """
+    Delete the days (and their tasks) in [start, end], or exactly the
+    given dates. Does not commit.
+    """
+
+    def scoped(query):
+        query = _date_filter(query.where(PlanDay.study_plan_id == plan_id), start, end)
+        if dates is not None:
+            query = query.where(PlanDay.date.in_(dates))
+        return query
+
+    db.execute(delete(PlanTask).where(PlanTask.plan_day_id.in_(scoped(select(PlanDay.id)))))
+    db.execute(scoped(delete(PlanDay)))
+
+
+def replace_plan_days(db: Session, plan_id: int, days: list, hours: int, start: date = None, end: date = None):
+    """
+    Rewrite only the [start, end] slice of a plan. Does not commit.
+    """
+
+    delete_plan_days(db, plan_id, start, end)
+    insert_plan_days(db, plan_id, days, hours)
+
+
+def load_plan_days(db: Session, plan: StudyPlan, start: date = None, end: date = None):
+    """
+    Days in [start, end] as [{"date": "YYYY-MM-DD", "tasks": [...]}],
+    ordered by date, read with one indexed join.
+    """
+
+    rows = db.execute(
+        _date_filter(
+            select(PlanDay.date, PlanTask.description)
+            .outerjoin(PlanTask, PlanTask.plan_day_id == PlanDay.id)
+            .where(PlanDay.study_plan_id == plan.id),
+            start,
+            end
+        ).order_by(PlanDay.date, PlanTask.position)
+    ).all()
+
+    if not rows:
+        return [
+            day for day in _legacy_days(plan)
+            if (start is None or date.fromisoformat(day["date"]) >= start)
+            and (end is None or date.fromisoformat(day["date"]) <= end)
+        ]
+
+    days = []
+    for day_date, description in rows:
+        if not days or days[-1]["date"] != str(day_date):
+            days.append({"date": str(day_date), "tasks": []})
+        if description is not None:
+            days[-1]["tasks"].append(description)
+
+    return days
+
+
+def plan_topics(db: Session, plan: StudyPlan):
+    """
+    Distinct topics in order of first appearance in the schedule.
+    """
+
+    topics = db.execute(
+        select(PlanTask.topic)
+        .join(PlanDay, PlanDay.id == PlanTask.plan_day_id)
+        .where(PlanDay.study_plan_id == plan.id, PlanTask.topic.isnot(None))
+        .group_by(PlanTask.topic)
+        .order_by(func.min(PlanDay.date), PlanTask.topic)
+    ).scalars().all()
+
+    if topics:
+        return list(topics)
+
+    return list(dict.fromkeys(
+        task_topic(task)
+        for day in _legacy_days(plan)
+        for task in day["tasks"]
+        if task_topic(task)
+    ))
+
+
+def plan_outline(db: Session, plan: StudyPlan):
+    """
+    summarize_days for a stored plan, computed with two aggregate
+    queries instead of loading every day.
+    """
+
+    days, first, last = db.execute(
+        select(func.count(), func.min(PlanDay.date), func.max(PlanDay.date))
+        .where(PlanDay.study_plan_id == plan.id)
+    ).one()
+
+    if not days:
+        return summarize_days(_legacy_days(plan))
+
+    rows = db.execute(
+        select(PlanTask.topic, func.count(), func.min(PlanDay.date), func.max(PlanDay.date))
+        .join(PlanDay, PlanDay.id == PlanTask.plan_day_id)
+        .where(PlanDay.study_plan_id == plan.id)
+        .group_by(PlanTask.topic)
+        .order_by(func.min(PlanDay.date), PlanTask.topic)
+    ).all()
+
+    return {
+        "days": days,
+        "tasks": sum(count for _, count, _, _ in rows),
+        "first": str(first),
+        "last": str(last),
+        "topics": [
+            {"topic": topic, "tasks": count, "first": str(topic_first), "last": str(topic_last)}
+            for topic, count, topic_first, topic_last in rows
+            if topic is not None
+        ]
+    }
+
+
+def diff_plan_days(db: Session, plan: StudyPlan, new_days: list, hours: int, start: date):
+    """
+    Compare a regenerated schedule against the stored one from `start`.
+    Returns (changed_days, removed_dates): days whose tasks or hours
+    differ (or are new), and stored dates the new schedule drops.
+    """
+
+    rows = db.execute(
+        select(PlanDay.date, PlanDay.hours, PlanTask.description)
+        .outerjoin(PlanTask, PlanTask.plan_day_id == PlanDay.id)
+        .where(PlanDay.study_plan_id == plan.id, PlanDay.date >= start)
+        .order_by(PlanDay.date, PlanTask.position)
+    ).all()
+
+    current = {}
+    for day_date, day_hours, description in rows:
+        entry = current.setdefault(str(day_date), (day_hours, []))
+        if description is not None:
+            entry[1].append(description)
+
+    changed = [
+        day for day in new_days
+        if current.get(str(day["date"])) != (hours, list(day["tasks"]))
+    ]
+
+    new_dates = {str(day["date"]) for day in new_days}
+    removed = [date.fromisoformat(d) for d in current if d not in new_dates]
+
+    return changed, removed
+
+
+def _progress_indexes(connection):
+    return {index["name"]: index for index in inspect(connection).get_indexes(PlanProgress.__tablename__)}
+
+
+def _has_progress_unique_index(db: Session) -> bool:
+    global _progress_upsert_ready
+
+    if not _progress_upsert_ready:
+        index = _progress_indexes(db.connection()).get(PROGRESS_UNIQUE_INDEX)
+        _progress_upsert_ready = bool(index and index["unique"])
+
+    return _progress_upsert_ready
+
+
+def reset_progress(db: Session, plan_id: int, dates: list):
+    """
+    Upsert blank progress rows on (study_plan_id, date) for `dates`.
+    Falls back to delete+insert until migrate_progress_unique has run.
+    Does not commit.
+    """
+
+    if not dates:
+        return
+
+    rows = [
+        {"study_plan_id": plan_id, "date": d, "completed": False, "completion_percentage": 0, "notes": None}
+        for d in dates
+    ]
+
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite") and _has_progress_unique_index(db):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(PlanProgress)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["study_plan_id", "date"],
+            set_={
+                "completed": stmt.excluded.completed,
+                "completion_percentage": stmt.excluded.completion_percentage,
+                "notes": stmt.excluded.notes
+            }
+        )
+        db.execute(stmt, rows)
+        return
+
+    db.execute(delete(PlanProgress).where(
+        PlanProgress.study_plan_id == plan_id,
+        PlanProgress.date.in_(dates)
+    ))
+    db.execute(insert(PlanProgress), rows)
+
+
+def ensure_plan_days(db: Session, plan: StudyPlan):
+    """
+    Move a legacy plan_content blob into plan_days before a partial
+    rewrite, so untouched days are not lost. Does not commit.
+    """
+
+    if not plan.plan_content:
+        return
+
+    already = db.execute(
+        select(PlanDay.id).where(PlanDay.study_plan_id == plan.id).limit(1)
+    ).first()
+
+    if not already:
+        insert_plan_days(db, plan.id, _legacy_days(plan), plan.study_hours_per_day)
+
+    plan.plan_content = None
+
+
+def migrate_plan_content(db: Session):
+    """
+    Move every plan still stored as a plan_content JSON blob into
+    plan_days / plan_tasks, one plan per transaction.
+    Returns the number of plans migrated.
+    """
+
+    plan_ids = db.execute(
+        select(StudyPlan.id).where(StudyPlan.plan_content.isnot(None))
+    ).scalars().all()
+
+    migrated = 0
+
+    for plan_id in plan_ids:
+        ensure_plan_days(db, db.get(StudyPlan, plan_id))
+        db.commit()
+        migrated += 1
+
+    return migrated
+
+
+def migrate_progress_unique(db: Session):
+    """
+    Give an existing plan_progress table its unique (study_plan_id, date)
+    index: keep the newest row of each duplicated day, rebuild the
+    affected plans' stats, create the index and drop the plain index it
+    replaces. Commits. Returns the number of duplicate rows removed.
+    """
+
+    from app.services.plan_stats_service import refresh_plan_stats
+
+    connection = db.connection()
+    indexes = _progress_indexes(connection)
+
+    removed = 0
+
+    if PROGRESS_UNIQUE_INDEX not in indexes:
+        groups = (
+            select(
+                PlanProgress.study_plan_id,
+                PlanProgress.date,
+                func.max(PlanProgress.id).label("keep_id")
+            )
+            .group_by(PlanProgress.study_plan_id, PlanProgress.date)
+            .having(func.count() > 1)
+            .subquery()
+        )
+
+        duplicates = db.execute(
+            select(PlanProgress.id, PlanProgress.study_plan_id).join(groups, and_(
+                PlanProgress.study_plan_id == groups.c.study_plan_id,
+                PlanProgress.date == groups.c.date,
+                PlanProgress.id != groups.c.keep_id
+            ))
+        ).all()
+
+        if duplicates:
+            db.execute(delete(PlanProgress).where(PlanProgress.id.in_([row.id for row in duplicates])))
+            for plan_id in {row.study_plan_id for row in duplicates}:
+                refresh_plan_stats(db, plan_id)
+            removed = len(duplicates)
+
+        index = next(i for i in PlanProgress.__table__.indexes if i.name == PROGRESS_UNIQUE_INDEX)
+        index.create(bind=connection)
+
+    if LEGACY_PROGRESS_INDEX in indexes:
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"DROP INDEX {LEGACY_PROGRESS_INDEX} ON {PlanProgress.__tablename__}"))
+        else:
+            connection.execute(text(f"DROP INDEX {LEGACY_PROGRESS_INDEX}"))
+
+    db.commit()
+
+    return removed
+
+
+if __name__ == "__main__":
+    from app.database import Base, SessionLocal, engine
+    import app.models  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="Plan storage maintenance")
+    parser.add_argument("command", choices=["migrate"])
+    parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    session = SessionLocal()
+    try:
+        print(f"migrated {migrate_plan_content(session)} plan(s)")
+        print(f"removed {migrate_progress_unique(session)} duplicate progress row(s)")
+    finally:
+        session.close()
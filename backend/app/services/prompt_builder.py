@@ -0,0 +1,122 @@
+import math
+import os
+import re
+import threading
+
+# Upper bound on prompt tokens per prompt type (system + user message)
+PROMPT_BUDGETS = {
+    "feedback": int(os.getenv("PROMPT_BUDGET_FEEDBACK", "1200")),
+    "adapt": int(os.getenv("PROMPT_BUDGET_ADAPT", "1600")),
+}
+
+# Days either side of today shown verbatim in the feedback prompt
+PROMPT_RECENT_DAYS = int(os.getenv("PROMPT_RECENT_DAYS", "7"))
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def _encoder(model: str):
+    """
+    tiktoken encoding for `model`, or None when tiktoken isn't installed.
+    """
+
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                import tiktoken
+            except ImportError:
+                _encoders[model] = None
+            else:
+                try:
+                    _encoders[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoders[model] = tiktoken.get_encoding("cl100k_base")
+        return _encoders[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    encoder = _encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text))
+
+    # Without tiktoken: err on the high side of the usual ~4 chars/token
+    words = len(re.findall(r"\w+|[^\w\s]", text))
+    return math.ceil(max(len(text) / 4, words * 1.1))
+
+
+def summarize_days(days: list):
+    """
+    Outline of a schedule ([{"date", "tasks"}]): day and task counts,
+    date range, and per-topic task counts and date span in order of
+    first appearance.
+    """
+
+    topics = {}
+    task_count = 0
+
+    for day in days:
+        for task in day["tasks"]:
+            task_count += 1
+            if " - " not in task:
+                continue
+            topic = task.split(" - ")[0]
+            entry = topics.setdefault(topic, {"topic": topic, "tasks": 0, "first": day["date"], "last": day["date"]})
+            entry["tasks"] += 1
+            entry["last"] = day["date"]
+
+    return {
+        "days": len(days),
+        "tasks": task_count,
+        "first": days[0]["date"] if days else None,
+        "last": days[-1]["date"] if days else None,
+        "topics": list(topics.values())
+    }
+
+
+def day_lines(days: list):
+    return [f"{day['date']}: {'; '.join(day['tasks'])}" for day in days]
+
+
+def outline_lines(outline: dict):
+    # Busiest topics first, so budget trimming drops the minor ones
+    topics = sorted(outline["topics"], key=lambda t: -t["tasks"])
+    return [f"{t['topic']}: {t['tasks']} tasks, {t['first']}..{t['last']}" for t in topics]
+
+
+def build_prompt(kind: str, head: str, sections: list, tail: str = "", system: str = "", model: str = "gpt-4o-mini"):
+    """
+    head + sections + tail, trimmed to PROMPT_BUDGETS[kind] tokens.
+
+    `sections` is a list of (title, lines, trimmable). While over budget,
+    the longest trimmable section loses the back half of its lines
+    (noted with a "... N more" line). Required sections are never cut,
+    so a prompt can still exceed the budget if they alone do.
+    """
+
+    budget = PROMPT_BUDGETS[kind]
+    kept = [len(lines) for _, lines, _ in sections]
+
+    def render():
+        parts = [head]
+        for (title, lines, _), count in zip(sections, kept):
+            body = list(lines[:count])
+            if count < len(lines):
+                body.append(f"... {len(lines) - count} more")
+            if body:
+                parts.append(f"{title}:\n" + "\n".join(body))
+        parts.append(tail)
+        return "\n\n".join(part.strip("\n") for part in parts if part)
+
+    prompt = render()
+
+    while count_tokens(system + prompt, model) > budget:
+        candidates = [i for i, (_, _, trimmable) in enumerate(sections) if trimmable and kept[i] > 0]
+        if not candidates:
+            break
+
+        longest = max(candidates, key=lambda i: kept[i])
+        kept[longest] //= 2
+        prompt = render()
+
+    return prompt
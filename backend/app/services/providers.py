@@ -0,0 +1,91 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Runtime state (SQLite caches and queues, vector indexes) goes here
+# unless its own path is configured; anchored to the backend directory
+# rather than wherever the server happens to be started from
+DATA_DIR = os.getenv(
+    "DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+)
+
+
+def data_path(name: str) -> str:
+    return os.path.join(DATA_DIR, name)
+
+
+class LazyResource:
+    """
+    Build an expensive object on first use and share it afterwards.
+    Heavy imports live inside the factory so importing a module that
+    depends on the resource stays cheap.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+
+def _make_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def _make_async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def _make_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+_openai_client = LazyResource("openai_client", _make_openai_client)
+_async_openai_client = LazyResource("async_openai_client", _make_async_openai_client)
+_embedding_model = LazyResource("embedding_model", _make_embedding_model)
+
+RESOURCES = [_openai_client, _async_openai_client, _embedding_model]
+
+
+def get_openai_client():
+    return _openai_client.get()
+
+
+def get_async_openai_client():
+    return _async_openai_client.get()
+
+
+def get_embedding_model():
+    return _embedding_model.get()
+
+
+def warm_up():
+    """
+    Load every shared resource now instead of on the first request.
+    """
+
+    for resource in RESOURCES:
+        resource.get()
+
+
+def loaded_resources():
+    return {resource.name: resource.loaded for resource in RESOURCES}
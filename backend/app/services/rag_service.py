@@ -1,62 +1,111 @@
-from pypdf import PdfReader
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from fastapi.concurrency import run_in_threadpool
 
-from app.services.embedding_service import generate_embedding
-from app.services.vector_store import add_embeddings, search
+from app.services.chunker import ChunkDeduplicator, iter_structured_chunks
+from app.services.embedding_service import generate_embedding, generate_embeddings
+from app.services.llm_cache import get_cached, make_key, store
+from app.services.llm_gateway import llm_gateway
+from app.services.pdf_extractor import count_pages, iter_pdf_pages
+from app.services.vector_store import add_embeddings, search, search_batch, snapshot_namespace
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
-def extract_text_from_pdf(file_path: str):
-    reader = PdfReader(file_path)
-    text = ""
-
-    for page in reader.pages:
-        extracted = page.extract_text()
-        if extracted:
-            text += extracted + "\n"
-
-    return text
-
-
-def chunk_text(text: str, chunk_size: int = 500):
-    chunks = []
-    for i in range(0, len(text), chunk_size):
-        chunks.append(text[i:i + chunk_size])
-    return chunks
-
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "256"))
 
-def process_pdf(file_path: str):
-    text = extract_text_from_pdf(file_path)
-    chunks = chunk_text(text)
+RAG_MODEL = "gpt-4o-mini"
+RAG_TEMPERATURE = 0.2
 
-    embeddings = []
-    for chunk in chunks:
-        embedding = generate_embedding(chunk)
-        embeddings.append(embedding)
+# LLM calls in flight per /rag/ask-batch request (the gateway's limits still apply)
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))
 
-    embeddings = np.vstack(embeddings)
 
-    add_embeddings(embeddings, chunks)
+def extract_text_from_pdf(file_path: str):
+    return "".join(page + "\n" for page in iter_pdf_pages(file_path) if page)
+
+
+def chunk_text(text: str, max_tokens: int = None, overlap_tokens: int = None):
+    return list(iter_chunks([text], max_tokens, overlap_tokens))
+
+
+def iter_chunks(pages, max_tokens: int = None, overlap_tokens: int = None):
+    """
+    Sentence- and paragraph-aligned chunks over the page texts (see
+    chunker). Only the sentences of the unfinished chunk are held.
+    """
+
+    return iter_structured_chunks(pages, max_tokens, overlap_tokens)
+
+
+def process_pdf(file_path: str, namespace: str, on_progress=None, chunk_ids: list = None):
+    """
+    Extract, chunk, embed and index a PDF page by page. Exact and
+    near-duplicate chunks are skipped before embedding.
+    `on_progress(pages_total, pages_processed, chunks_added, chunks_skipped)`
+    is called after each page and after each batch is added to the index.
+    The ids of indexed chunks are appended to `chunk_ids` as each batch
+    lands, so a caller can clean up after a failure part-way through.
+    """
+
+    pages_total = count_pages(file_path)
+    pages_processed = 0
+    chunks_added = 0
+    dedup = ChunkDeduplicator()
+
+    def report():
+        if on_progress:
+            on_progress(pages_total, pages_processed, chunks_added, dedup.skipped)
+
+    def pages():
+        nonlocal pages_processed
+        for page in iter_pdf_pages(file_path, pages_total):
+            pages_processed += 1
+            report()
+            yield page
+
+    batch = []
+
+    def flush():
+        nonlocal chunks_added
+        ids = add_embeddings(generate_embeddings(batch), batch, namespace=namespace)
+        if chunk_ids is not None:
+            chunk_ids.extend(int(i) for i in ids)
+        chunks_added += len(batch)
+        batch.clear()
+        report()
+
+    try:
+        for chunk in iter_chunks(pages()):
+            if dedup.is_duplicate(chunk):
+                continue
+            batch.append(chunk)
+            if len(batch) >= INGEST_BATCH_CHUNKS:
+                flush()
+
+        if batch:
+            flush()
+    finally:
+        # One index write per ingestion rather than one per batch
+        snapshot_namespace(namespace)
+
+    if not chunks_added:
+        return {
+            "message": "No text found in PDF",
+            "chunks_added": 0,
+            "chunks_skipped": dedup.skipped
+        }
 
     return {
         "message": "PDF processed successfully",
-        "chunks_added": len(chunks)
+        "chunks_added": chunks_added,
+        "chunks_skipped": dedup.skipped
     }
 
 
-def answer_question(question: str):
-
-    # 1️⃣ Embed query
-    query_embedding = generate_embedding(question)
-    query_embedding = np.array([query_embedding])
-
-    # 2️⃣ Retrieve top chunks
-    retrieved_chunks = search(query_embedding, top_k=3)
+def rag_messages(question: str, retrieved_chunks: list):
 
     context = "\n\n".join(retrieved_chunks)
 
@@ -71,14 +120,92 @@ Question:
 {question}
 """
 
+    return [
+        {"role": "system", "content": "You are a strict academic assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def build_rag_messages(question: str, namespaces: list):
+
+    # 1️⃣ Embed query
+    query_embedding = generate_embedding(question)
+    query_embedding = np.array([query_embedding])
+
+    # 2️⃣ Retrieve top chunks
+    retrieved_chunks = search(query_embedding, top_k=3, namespace=namespaces)
+
+    return rag_messages(question, retrieved_chunks)
+
+
+def complete_rag_answer(messages: list):
+
+    # Retrieved context is part of the key, so new material misses naturally
+    cache_key = make_key(RAG_MODEL, RAG_TEMPERATURE, messages)
+    cached = get_cached(cache_key)
+    if cached is not None:
+        return cached
+
     # 3️⃣ Ask LLM
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a strict academic assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
-    )
-
-    return response.choices[0].message.content
\ No newline at end of file
+    answer = llm_gateway.chat(RAG_MODEL, messages, RAG_TEMPERATURE)
+    store(cache_key, answer)
+
+    return answer
+
+
+def answer_question(question: str, namespaces: list):
+    return complete_rag_answer(build_rag_messages(question, namespaces))
+
+
+def answer_questions(questions: list, namespaces: list):
+    """
+    Answer several questions against the same material: one batched
+    encode, one multi-row search per namespace, then up to
+    RAG_BATCH_CONCURRENCY LLM calls at a time.
+    Returns [{"question", "answer", "error"}] in the input order.
+    """
+
+    if not questions:
+        return []
+
+    embeddings = generate_embeddings(questions)
+    contexts = search_batch(embeddings, top_k=3, namespace=namespaces)
+
+    def answer(item):
+        question, retrieved_chunks = item
+        try:
+            return {
+                "question": question,
+                "answer": complete_rag_answer(rag_messages(question, retrieved_chunks)),
+                "error": None
+            }
+        except Exception as e:
+            return {"question": question, "answer": None, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=min(RAG_BATCH_CONCURRENCY, len(questions))) as pool:
+        return list(pool.map(answer, zip(questions, contexts)))
+
+
+async def stream_answer(question: str, namespaces: list):
+    """
+    Async generator yielding answer tokens as the model produces them.
+    Retrieval (embedding, FAISS search) and cache lookups block, so
+    they run in the threadpool.
+    """
+
+    messages = await run_in_threadpool(build_rag_messages, question, namespaces)
+
+    # The answer cache is SQLite: keep its I/O off the event loop too
+    cache_key = make_key(RAG_MODEL, RAG_TEMPERATURE, messages)
+    cached = await run_in_threadpool(get_cached, cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+
+    async for token in llm_gateway.stream_chat(RAG_MODEL, messages, RAG_TEMPERATURE):
+        parts.append(token)
+        yield token
+
+    await run_in_threadpool(store, cache_key, "".join(parts))
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class SQLiteStore:
+    """
+    Base for the SQLite-backed stores that several worker processes share
+    (the document registry, the AI job queue).
+
+    The file is opened on first use rather than at import. Each process
+    gets an owner id to tag the rows it is working on; once start() is
+    called (from the app's startup hook) a daemon thread runs maintain()
+    every `heartbeat_seconds` to refresh those rows and clean up after
+    processes that died.
+    """
+
+    def __init__(self, path: str, heartbeat_seconds: float, name: str):
+        self.path = path
+        self.heartbeat_seconds = heartbeat_seconds
+        self.name = name
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Reentrant so methods can call each other under the lock
+        self._lock = threading.RLock()
+        self._db = None
+        self._started = False
+
+    @property
+    def _conn(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    self._create_schema(conn)
+                    self._db = conn
+        return self._db
+
+    def _create_schema(self, conn):
+        raise NotImplementedError
+
+    @staticmethod
+    def _add_missing_columns(conn, table: str, columns):
+        # Files created before these columns existed
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, kind in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def maintain(self):
+        raise NotImplementedError
+
+    def start(self):
+        """
+        Run maintain() now and then every heartbeat in the background.
+        Safe to call more than once.
+        """
+
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        self.maintain()
+        threading.Thread(target=self._heartbeat_loop, name=f"{self.name}-heartbeat", daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                self.maintain()
+            except sqlite3.Error:
+                # Locked by another process; try again next beat
+                pass
@@ -1,30 +1,747 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
 import faiss
 import numpy as np
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+
+from app.services.providers import data_path
 
 dimension = 384  # all-MiniLM-L6-v2 output size
-index = faiss.IndexFlatL2(dimension)
 
-documents = []  # stores original text chunks
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", data_path("vector_store"))
+
+# Namespaces at or above this many vectors switch from exact to IVF search
+VECTOR_ANN_THRESHOLD = int(os.getenv("VECTOR_ANN_THRESHOLD", "20000"))
+VECTOR_NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+
+# How vectors are stored once a namespace has enough of them to train on
+# (VECTOR_COMPRESS_THRESHOLD, or 39 * 256 = 9984 for pq):
+#   flat  - raw float32, 1536 bytes per vector (exact)
+#   fp16  - scalar quantized to float16, 768 bytes
+#   int8  - scalar quantized to 8 bits per dimension, 384 bytes
+#   pq    - product quantized, VECTOR_PQ_M bytes
+# See benchmarks/bench_vector_storage.py for the recall each costs.
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "flat")
+VECTOR_COMPRESS_THRESHOLD = int(os.getenv("VECTOR_COMPRESS_THRESHOLD", "1024"))
+VECTOR_PQ_M = int(os.getenv("VECTOR_PQ_M", "48"))  # must divide the dimension
+
+# k-means (PQ codebooks, IVF centroids) wants this many training points
+# per centroid; FAISS warns and quality drops below it
+MIN_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256  # 8-bit codes
+
+# Adds go to an in-memory copy of the index; it is snapshotted to disk
+# (and becomes searchable) once this many vectors or seconds are
+# pending, and when an ingestion finishes (snapshot_namespace)
+VECTOR_SNAPSHOT_VECTORS = int(os.getenv("VECTOR_SNAPSHOT_VECTORS", "8192"))
+VECTOR_SNAPSHOT_SECONDS = float(os.getenv("VECTOR_SNAPSHOT_SECONDS", "30"))
+
+# Open namespaces kept in memory; least recently used ones beyond this
+# are closed once they have nothing left to snapshot
+VECTOR_NAMESPACE_CACHE = int(os.getenv("VECTOR_NAMESPACE_CACHE", "256"))
+
+DEFAULT_NAMESPACE = "default"
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.dat"
+OFFSETS_FILE = "offsets.npy"
+IDS_FILE = "ids.npy"
+
+
+def _atomic_replace(path: str, write):
+    """
+    Write to a temp file next to `path`, fsync it, then rename over `path`
+    so readers never observe a half-written snapshot.
+    """
+
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+def _save_array(path: str, array):
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+class ChunkStore:
+    """
+    Chunk texts on disk, addressed by stable chunk id.
+    chunks.dat holds the UTF-8 bytes back to back, offsets.npy holds
+    len(chunks) + 1 int64 byte offsets into it, and ids.npy the ascending
+    chunk id of each entry followed by the next id to hand out, so ids
+    are never reused. All three are memory-mapped.
+    """
+
+    def __init__(self, directory: str):
+        self.data_path = os.path.join(directory, CHUNKS_FILE)
+        self.offsets_path = os.path.join(directory, OFFSETS_FILE)
+        self.ids_path = os.path.join(directory, IDS_FILE)
+        # (data, offsets, ids), swapped as one so readers see a consistent set
+        self._state = (None, np.zeros(1, dtype="int64"), np.zeros(1, dtype="int64"))
+        self.reload()
+
+    def __len__(self):
+        return len(self._state[2]) - 1
+
+    @property
+    def next_id(self) -> int:
+        return int(self._state[2][-1])
+
+    def reload(self):
+        """
+        Reread the files, e.g. after another process appended to them.
+        """
+
+        offsets = np.zeros(1, dtype="int64")
+        if os.path.exists(self.offsets_path):
+            offsets = np.load(self.offsets_path, mmap_mode="r")
+
+        if os.path.exists(self.ids_path):
+            ids = np.load(self.ids_path, mmap_mode="r")
+        else:
+            # Written before chunk ids existed: an entry's id is its position
+            ids = np.arange(len(offsets), dtype="int64")
+
+        # ids.npy is written last; offsets past it are from an interrupted append
+        offsets = offsets[:len(ids)]
+
+        data = None
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > 0:
+            with open(self.data_path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._state = (data, offsets, ids)
+
+    def append(self, ids, texts):
+        _, offsets, old_ids = self._state
+        encoded = [t.encode("utf-8") for t in texts]
+
+        start = int(offsets[-1])
+        lengths = np.fromiter((len(b) for b in encoded), dtype="int64", count=len(encoded))
+        new_offsets = np.concatenate([offsets, start + np.cumsum(lengths)])
+        new_ids = np.concatenate([old_ids[:-1], ids, [ids[-1] + 1]]).astype("int64")
+
+        # Bytes past the last committed offset are garbage from a crashed write
+        with open(self.data_path, "ab") as f:
+            f.truncate(start)
+            f.write(b"".join(encoded))
+            f.flush()
+            os.fsync(f.fileno())
+
+        _atomic_replace(self.offsets_path, lambda p: _save_array(p, new_offsets))
+        _atomic_replace(self.ids_path, lambda p: _save_array(p, new_ids))
+        self.reload()
+
+    def retain(self, live_ids):
+        """
+        Drop every entry whose id is not in `live_ids`, rewriting the
+        files without them. Ids of the kept entries don't change.
+        """
+
+        data, offsets, ids = self._state
+        keep = np.isin(ids[:-1], live_ids)
+        if keep.all():
+            return
+
+        pieces = [data[int(offsets[p]):int(offsets[p + 1])] for p in np.flatnonzero(keep)]
+        lengths = np.fromiter((len(b) for b in pieces), dtype="int64", count=len(pieces))
+        new_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype("int64")
+        new_ids = np.concatenate([ids[:-1][keep], ids[-1:]]).astype("int64")
+
+        def write_data(path):
+            with open(path, "wb") as f:
+                f.write(b"".join(pieces))
+
+        _atomic_replace(self.data_path, write_data)
+        _atomic_replace(self.offsets_path, lambda p: _save_array(p, new_offsets))
+        _atomic_replace(self.ids_path, lambda p: _save_array(p, new_ids))
+        self.reload()
+
+    def get(self, chunk_id: int):
+        """
+        Text of `chunk_id`, or None if there is no such chunk.
+        """
+
+        data, offsets, ids = self._state
+        pos = int(np.searchsorted(ids[:-1], chunk_id))
+        if pos >= len(ids) - 1 or ids[pos] != chunk_id:
+            return None
+        return data[int(offsets[pos]):int(offsets[pos + 1])].decode("utf-8")
+
+
+class PersistentIndex:
+    """
+    FAISS index plus its chunk texts, snapshotted to `directory`.
+    Vectors are stored under their chunk ids (IndexIDMap2 around flat and
+    compressed indexes; IVF keeps ids itself), so chunks can be removed
+    without renumbering the rest.
+    Searches run against a memory-mapped snapshot of the index file.
+    Changes are applied to a writable copy kept in memory; adds are
+    snapshotted in bulk (see VECTOR_SNAPSHOT_VECTORS), removals at once.
+
+    Worker processes share namespaces on disk. A writer holds the
+    namespace's file lock (flock on its directory) from its first unsaved
+    add until the snapshot, and rereads the chunk files and index under
+    it, so ids, chunk bytes and vectors from another process are never
+    overwritten. Searches pick up snapshots written elsewhere.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.lock = threading.RLock()
+        # Set once evicted from the namespace cache or dropped; writers
+        # that still hold a reference go back to get_namespace()
+        self.retired = False
+
+        # Writable copy and the adds it holds that are not on disk yet
+        self._writable = None
+        self._pending = 0
+        self._pending_since = None
+        self._file_state = None  # index file as last read or written
+        self._dir_fd = None  # held namespace file lock
+
+        # Chunks are written before the index, so texts past the last
+        # snapshot may exist without vectors. They are never returned,
+        # and remove() drops them (the stale-ingestion reaper calls it).
+        self.chunks = ChunkStore(directory)
+        self.index = self._open_index()
+
+    def _stat_index(self):
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _open_index(self):
+        self._file_state = self._stat_index()
+        if self._file_state is None:
+            return _empty_index()
+
+        # MMAP_IFC maps flat/SQ/PQ codes as well as IVF lists; plain
+        # IO_FLAG_MMAP would read non-IVF codes into memory
+        index = faiss.read_index(self.index_path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = VECTOR_NPROBE
+        return index
+
+    def _writable_index(self):
+        if not os.path.exists(self.index_path):
+            return _empty_index()
+
+        index = faiss.read_index(self.index_path)
+
+        # Flat or compressed indexes saved before chunk ids existed hold
+        # positional ids; IVF indexes already store theirs
+        if not isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+            return _with_positional_ids(index)
+
+        return index
+
+    def _reload(self):
+        # Another process wrote a snapshot since we last read or wrote one
+        self.chunks.reload()
+        self.index = self._open_index()
+        self._writable = None
+
+    def refresh(self):
+        """
+        Pick up a snapshot written by another process. Cheap (one stat)
+        when nothing changed.
+        """
+
+        if self._dir_fd is None and self._stat_index() != self._file_state:
+            with self.lock:
+                if self._dir_fd is None and self._stat_index() != self._file_state:
+                    self._reload()
+
+    def _lock_files(self):
+        # Caller holds self.lock. Kept until _unlock_files.
+        if self._dir_fd is not None:
+            return
+
+        self._dir_fd = _lock_directory(self.directory)
+
+        # Chunk files can also hold a crashed writer's unsnapshotted appends
+        self.chunks.reload()
+        if self._stat_index() != self._file_state:
+            self._reload()
+
+    def _unlock_files(self):
+        if self._dir_fd is not None:
+            _unlock_directory(self._dir_fd)
+            self._dir_fd = None
+
+    def _load_writable(self):
+        if self._writable is None:
+            self._writable = self._writable_index()
+        return self._writable
+
+    def _save(self, index, keep_writable: bool = False):
+        _atomic_replace(self.index_path, lambda p: faiss.write_index(index, p))
+        self.index = self._open_index()
+
+        self._writable = index if keep_writable else None
+        self._pending = 0
+        self._pending_since = None
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    def add(self, embeddings, texts):
+        """
+        Index `texts` under fresh chunk ids and return the ids.
+        """
+
+        with self.lock:
+            self._lock_files()
+            try:
+                ids = np.arange(self.chunks.next_id, self.chunks.next_id + len(texts), dtype="int64")
+
+                index = self._load_writable()
+                index.add_with_ids(embeddings, ids)
+
+                if _needs_rebuild(index):
+                    index = self._writable = _rebuild(index)
+
+                self.chunks.append(ids, texts)
+
+                self._pending += len(ids)
+                if self._pending_since is None:
+                    self._pending_since = time.monotonic()
+
+                if (
+                    self._pending >= VECTOR_SNAPSHOT_VECTORS
+                    or time.monotonic() - self._pending_since >= VECTOR_SNAPSHOT_SECONDS
+                ):
+                    self._save(index, keep_writable=True)
+
+                return ids
+            finally:
+                if not self._pending:
+                    self._unlock_files()
+
+    def snapshot(self):
+        """
+        Write pending adds to disk, making them searchable, and release
+        the writable copy and the namespace's file lock.
+        """
+
+        with self.lock:
+            if self._pending:
+                self._save(self._writable)
+            self._writable = None
+            self._unlock_files()
+
+    def remove(self, ids) -> int:
+        """
+        Remove the given chunk ids; returns how many were indexed.
+        """
+
+        with self.lock:
+            self._lock_files()
+            try:
+                if self._writable is None and not os.path.exists(self.index_path):
+                    return 0
+
+                index = self._load_writable()
+                removed = index.remove_ids(np.asarray(ids, dtype="int64"))
+
+                self._save(index)
+                self.chunks.retain(index_ids(self.index))
+
+                return removed
+            finally:
+                if not self._pending:
+                    self._unlock_files()
+
+    def search(self, query_embedding, top_k: int):
+        return self.index.search(query_embedding, top_k)
+
+
+def _lock_directory(directory: str) -> int:
+    """
+    Block until this process holds the exclusive flock on `directory`;
+    returns the descriptor to pass to _unlock_directory.
+    """
+
+    while True:
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        # Dropped by its previous holder: lock the recreated directory
+        if os.fstat(fd).st_nlink > 0:
+            return fd
+        _unlock_directory(fd)
+
+
+def _unlock_directory(fd: int):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _empty_index():
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+
+def _with_positional_ids(index):
+    """
+    Wrap a bare flat/SQ/PQ index in IndexIDMap2, giving each vector its
+    position as id. The stored codes are copied as-is, so nothing is
+    re-quantized.
+    """
+
+    codes = faiss.vector_to_array(index.codes).reshape(index.ntotal, -1)
+
+    empty = faiss.clone_index(index)
+    empty.reset()
 
+    wrapped = faiss.IndexIDMap2(empty)
+    if index.ntotal:
+        wrapped.add_sa_codes(codes, np.arange(index.ntotal, dtype="int64"))
+    return wrapped
 
-def add_embeddings(embeddings, texts):
-    global documents
 
-    index.add(embeddings)
-    documents.extend(texts)
+def _inner(index):
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
 
 
-def search(query_embedding, top_k=3):
+def index_ids(index):
+    """
+    Chunk ids currently held by `index`.
+    """
 
-    if index.ntotal == 0:
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map)
+
+    if isinstance(index, faiss.IndexIVF):
+        lists = index.invlists
+        return np.concatenate([np.zeros(0, dtype="int64")] + [
+            faiss.rev_swig_ptr(lists.get_ids(l), lists.list_size(l)).copy()
+            for l in range(index.nlist)
+            if lists.list_size(l)
+        ])
+
+    return np.arange(index.ntotal, dtype="int64")
+
+
+def _code_spec(storage: str) -> str:
+    specs = {"flat": "Flat", "fp16": "SQfp16", "int8": "SQ8", "pq": f"PQ{VECTOR_PQ_M}"}
+    if storage not in specs:
+        raise ValueError(f"Unknown VECTOR_STORAGE {storage!r}; expected one of {', '.join(specs)}")
+    return specs[storage]
+
+
+def compress_threshold(storage: str = None) -> int:
+    """
+    Vectors a namespace needs before it is rebuilt into `storage`:
+    VECTOR_COMPRESS_THRESHOLD, raised for PQ to what its codebooks need.
+    """
+
+    storage = storage or VECTOR_STORAGE
+    if storage == "pq":
+        return max(VECTOR_COMPRESS_THRESHOLD, MIN_POINTS_PER_CENTROID * PQ_CENTROIDS)
+    return VECTOR_COMPRESS_THRESHOLD
+
+
+def ivf_lists(count: int) -> int:
+    """
+    IVF list count for `count` vectors: about 4 * sqrt(n), capped so
+    every centroid has MIN_POINTS_PER_CENTROID points to train on.
+    """
+
+    return max(1, min(int(4 * np.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+
+
+def train_index(vectors, storage: str = None, ivf: bool = None):
+    """
+    An empty index trained on `vectors` with the given storage (default
+    VECTOR_STORAGE). IVF partitioning is used once there are
+    VECTOR_ANN_THRESHOLD vectors unless `ivf` says otherwise.
+    """
+
+    storage = storage or VECTOR_STORAGE
+    if ivf is None:
+        ivf = len(vectors) >= VECTOR_ANN_THRESHOLD
+
+    spec = _code_spec(storage)
+    if ivf:
+        spec = f"IVF{ivf_lists(len(vectors))},{spec}"
+
+    index = faiss.index_factory(dimension, spec, faiss.METRIC_L2)
+    index.train(vectors)
+
+    if ivf:
+        index.nprobe = VECTOR_NPROBE
+
+    return index
+
+
+def build_index(vectors, storage: str = None, ivf: bool = None):
+    index = train_index(vectors, storage, ivf)
+    index.add(vectors)
+    return index
+
+
+def _needs_rebuild(index) -> bool:
+    """
+    Namespaces start as exact float32 (nothing to train on yet). They are
+    rebuilt once: into VECTOR_STORAGE at compress_threshold() vectors,
+    and into IVF at VECTOR_ANN_THRESHOLD.
+    """
+
+    inner = _inner(index)
+
+    if isinstance(inner, faiss.IndexIVF):
+        return False
+
+    if index.ntotal >= VECTOR_ANN_THRESHOLD:
+        return True
+
+    return (
+        VECTOR_STORAGE != "flat"
+        and isinstance(inner, faiss.IndexFlat)
+        and index.ntotal >= compress_threshold()
+    )
+
+
+def _rebuild(index):
+    # Only non-IVF indexes are rebuilt, and those are always IndexIDMap2
+    vectors = _inner(index).reconstruct_n(0, index.ntotal)
+    ids = index_ids(index)
+
+    rebuilt = train_index(vectors)
+
+    # IVF stores ids itself; IndexIDMap2 around IVF would break remove_ids
+    if not isinstance(rebuilt, faiss.IndexIVF):
+        rebuilt = faiss.IndexIDMap2(rebuilt)
+
+    rebuilt.add_with_ids(vectors, ids)
+    return rebuilt
+
+
+_namespaces = OrderedDict()  # namespace -> PersistentIndex, least recently used first
+_namespaces_lock = threading.Lock()
+
+
+def _safe_component(value) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", str(value)).strip(".") or "_"
+
+
+def namespace_for(user_id: int, document_id: str) -> str:
+    return f"user_{user_id}/{_safe_component(document_id)}"
+
+
+def user_namespaces(user_id: int):
+    user_dir = os.path.join(VECTOR_STORE_DIR, f"user_{user_id}")
+    if not os.path.isdir(user_dir):
         return []
 
-    distances, indices = index.search(query_embedding, top_k)
+    return [
+        f"user_{user_id}/{name}"
+        for name in sorted(os.listdir(user_dir))
+        if os.path.isdir(os.path.join(user_dir, name))
+    ]
 
-    results = []
 
-    for idx in indices[0]:
-        if 0 <= idx < len(documents):
-            results.append(documents[idx])
+def _namespace_dir(namespace: str) -> str:
+    return os.path.join(VECTOR_STORE_DIR, *(_safe_component(p) for p in namespace.split("/")))
+
+
+def namespace_exists(namespace: str) -> bool:
+    return os.path.isdir(_namespace_dir(namespace))
+
+
+def _evict_namespaces():
+    # Caller holds _namespaces_lock. Stores with unsaved adds or a write
+    # in progress are skipped; they are evicted on a later pass. The most
+    # recent entry is the one being handed out, so it always stays.
+    excess = len(_namespaces) - VECTOR_NAMESPACE_CACHE
+
+    for namespace, store in list(_namespaces.items())[:-1]:
+        if excess <= 0:
+            break
+
+        if not store.lock.acquire(blocking=False):
+            continue
+        try:
+            if store._pending:
+                continue
+            store.retired = True
+            del _namespaces[namespace]
+            excess -= 1
+        finally:
+            store.lock.release()
+
+
+def get_namespace(namespace: str, create: bool = False):
+    """
+    The open store for `namespace`, or None if it doesn't exist on disk
+    and `create` is false (a search for an unknown document opens nothing).
+    """
+
+    with _namespaces_lock:
+        store = _namespaces.get(namespace)
+
+        if store is not None:
+            _namespaces.move_to_end(namespace)
+            return store
+
+        if not create and not namespace_exists(namespace):
+            return None
+
+        store = PersistentIndex(_namespace_dir(namespace))
+        _namespaces[namespace] = store
+        _evict_namespaces()
+
+    return store
+
+
+@contextmanager
+def _locked_namespace(namespace: str, create: bool = False):
+    """
+    get_namespace() with the store's lock held, retrying if the store was
+    evicted or dropped between the lookup and taking the lock.
+    """
+
+    while True:
+        store = get_namespace(namespace, create)
+
+        if store is None:
+            yield None
+            return
+
+        with store.lock:
+            if not store.retired:
+                yield store
+                return
+
+
+def drop_namespace(namespace: str):
+    """
+    Delete a namespace's index and chunks from disk.
+    """
+
+    with _namespaces_lock:
+        store = _namespaces.pop(namespace, None)
+
+        if store is not None:
+            with store.lock:
+                store.retired = True
+                store._unlock_files()
+                _remove_directory(store.directory)
+        else:
+            _remove_directory(_namespace_dir(namespace))
+
+
+def _remove_directory(directory: str):
+    # Under the namespace lock, so no other process is mid-write
+    if not os.path.isdir(directory):
+        return
+
+    fd = _lock_directory(directory)
+    try:
+        shutil.rmtree(directory, ignore_errors=True)
+    finally:
+        _unlock_directory(fd)
+
+
+def add_embeddings(embeddings, texts, namespace=DEFAULT_NAMESPACE):
+    """
+    Returns the chunk ids the texts were stored under.
+    """
+
+    with _locked_namespace(namespace, create=True) as store:
+        return store.add(np.ascontiguousarray(embeddings, dtype="float32"), texts)
+
+
+def snapshot_namespace(namespace=DEFAULT_NAMESPACE):
+    """
+    Persist a namespace's pending adds; call once an ingestion is done.
+    """
+
+    with _locked_namespace(namespace) as store:
+        if store is not None:
+            store.snapshot()
+
+
+def remove_embeddings(ids, namespace=DEFAULT_NAMESPACE) -> int:
+    if len(ids) == 0:
+        return 0
+
+    with _locked_namespace(namespace) as store:
+        return store.remove(ids) if store is not None else 0
+
+
+def namespace_ids(namespace=DEFAULT_NAMESPACE):
+    store = get_namespace(namespace)
+    if store is None:
+        return np.zeros(0, dtype="int64")
+    return index_ids(store.index)
+
+
+def search(query_embedding, top_k=3, namespace=DEFAULT_NAMESPACE):
+    """
+    Return the top_k closest chunk texts.
+    `namespace` may be a single namespace or a list; results from several
+    namespaces are merged by distance.
+    """
+
+    return search_batch(query_embedding[:1], top_k, namespace)[0]
+
+
+def search_batch(query_embeddings, top_k=3, namespace=DEFAULT_NAMESPACE):
+    """
+    search() for many queries at once: one multi-row index search per
+    namespace. Returns a list of top_k chunk texts per query row.
+    """
+
+    namespaces = [namespace] if isinstance(namespace, str) else namespace
+    queries = np.ascontiguousarray(query_embeddings, dtype="float32")
+
+    hits = [[] for _ in range(len(queries))]
+
+    for ns in namespaces:
+        store = get_namespace(ns)
+        if store is None:
+            continue
+
+        store.refresh()
+        if store.ntotal == 0:
+            continue
+
+        distances, indices = store.search(queries, top_k)
+
+        for row in range(len(queries)):
+            for distance, chunk_id in zip(distances[row], indices[row]):
+                text = store.chunks.get(int(chunk_id)) if chunk_id >= 0 else None
+                if text is not None:
+                    hits[row].append((float(distance), text))
+
+    results = []
+    for row_hits in hits:
+        row_hits.sort(key=lambda hit: hit[0])
+        results.append([text for _, text in row_hits[:top_k]])
 
-    return results
\ No newline at end of file
+    return results
@@ -1,23 +1,144 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
+import time
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with any other cost are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt runs on its own small pool so login bursts can't starve the
+# shared request threadpool; past the queue limit callers are rejected
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
+# Identity lookups for authenticated requests
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+# Put name/email in the token so get_current_user never needs the DB
+TOKEN_IDENTITY_CLAIMS = os.getenv("TOKEN_IDENTITY_CLAIMS", "false").lower() == "true"
+
+# Accounts allowed to read the /metrics endpoints
+METRICS_ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.getenv("METRICS_ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Dedicated, bounded executor for bcrypt work with basic metrics.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {"completed": 0, "rejected": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self._stats["completed"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+
+        submitted = time.monotonic()
+
+        def task():
+            self._record_wait(time.monotonic() - submitted)
+            return fn(*args)
+
+        try:
+            future = self._executor.submit(task)
+        except BaseException:
+            self._finished()
+            raise
+
+        # Counted until the work itself is done (or dropped from the
+        # queue), not until the caller stops waiting: a cancelled login
+        # leaves its bcrypt call queued or running
+        future.add_done_callback(lambda _: self._finished())
+
+        return await asyncio.wrap_future(future)
+
+    def _finished(self):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            pending = self._pending
+
+        completed = stats["completed"]
+
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(pending, self.workers),
+            "queued": max(0, pending - self.workers),
+            "completed": completed,
+            "rejected": stats["rejected"],
+            "avg_wait_ms": round(stats["wait_seconds_total"] / completed * 1000, 2) if completed else 0.0,
+            "max_wait_ms": round(stats["wait_seconds_max"] * 1000, 2),
+            "bcrypt_rounds": BCRYPT_ROUNDS
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.run(hash_password, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash was
+    made with a different bcrypt cost and should be replaced.
+    """
+
+    return await password_hasher.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -25,23 +146,75 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims_for(user) -> dict:
+    claims = {"sub": str(user.id)}
+    if TOKEN_IDENTITY_CLAIMS:
+        claims.update({"name": user.name, "email": user.email})
+    return claims
+
+
+class IdentityCache:
+    """
+    Bounded LRU of (name, email) by user id, each entry valid for a TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id: int, identity: tuple):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+identity_cache = IdentityCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int):
+    """
+    Call after changing or deleting a user so stale identities aren't
+    served from this process's cache. Identity claims already baked into
+    issued tokens still live until they expire; authorization checks
+    use get_current_db_user for that reason.
+    """
+
+    identity_cache.invalidate(user_id)
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+)
+
 
+def _token_claims(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -52,9 +225,69 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    return int(user_id), payload
+
+
+async def _load_user(db: AsyncSession, user_id: int):
+    user = await db.get(User, user_id)
 
     if user is None:
         raise credentials_exception
 
-    return user
\ No newline at end of file
+    if USER_CACHE_ENABLED:
+        identity_cache.set(user_id, (user.name, user.email))
+
+    return user
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Resolve the caller from the token, then the identity cache, and only
+    then the database. Identities from the first two are transient,
+    detached User objects carrying id, name and email as of when the
+    token was issued or cached: fine for scoping queries by id, but not
+    for decisions on email or other mutable fields (see
+    get_current_db_user).
+    """
+
+    user_id, payload = _token_claims(token)
+
+    if "name" in payload and "email" in payload:
+        return User(id=user_id, name=payload["name"], email=payload["email"])
+
+    if USER_CACHE_ENABLED:
+        identity = identity_cache.get(user_id)
+        if identity is not None:
+            return User(id=user_id, name=identity[0], email=identity[1])
+
+    return await _load_user(db, user_id)
+
+
+async def get_current_db_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    get_current_user, always read from the database. Use it wherever the
+    user's email decides access, so a changed email or a revoked admin
+    takes effect immediately rather than when the token expires.
+    """
+
+    user_id, _ = _token_claims(token)
+
+    return await _load_user(db, user_id)
+
+
+async def get_metrics_admin(current_user: User = Depends(get_current_db_user)):
+    """
+    Gate for the operational metrics endpoints: the caller's stored
+    email must be listed in METRICS_ADMIN_EMAILS.
+    """
+
+    if current_user.email.lower() not in METRICS_ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return current_user
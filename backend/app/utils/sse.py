@@ -0,0 +1,24 @@
+import json
+
+
+def sse_event(data, event: str = None) -> str:
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+async def sse_stream(tokens, final: dict = None):
+    """
+    Wrap an async token generator as server-sent events.
+    Emits one `data` event per token, then `done` (or `error`).
+    """
+
+    try:
+        async for token in tokens:
+            yield sse_event({"token": token})
+    except Exception as e:
+        yield sse_event({"error": str(e)}, event="error")
+        return
+
+    yield sse_event(final or {}, event="done")
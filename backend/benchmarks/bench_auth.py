@@ -0,0 +1,70 @@
+"""
+Requests/sec for an authenticated endpoint with the identity cache off,
+on, and with identity claims carried in the token.
+
+Uses a throwaway SQLite database unless DATABASE_URL is already set.
+Run from backend/:
+    python -m benchmarks.bench_auth [--requests N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_auth.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils import security  # noqa: E402
+
+
+def login(client, email, password):
+    response = client.post("/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def measure(client, headers, requests):
+    client.get("/auth/me", headers=headers).raise_for_status()
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get("/auth/me", headers=headers)
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    email, password = "bench@example.com", "bench-password"
+
+    with TestClient(app) as client:
+        client.post("/auth/signup", json={"name": "Bench", "email": email, "password": password})
+
+        security.TOKEN_IDENTITY_CLAIMS = False
+        headers = login(client, email, password)
+
+        security.USER_CACHE_ENABLED = False
+        uncached = measure(client, headers, args.requests)
+
+        security.USER_CACHE_ENABLED = True
+        cached = measure(client, headers, args.requests)
+
+        security.TOKEN_IDENTITY_CLAIMS = True
+        claims = measure(client, login(client, email, password), args.requests)
+
+    print(f"requests per run:      {args.requests}")
+    print(f"cache off:             {uncached:8.1f} req/sec")
+    print(f"cache on:              {cached:8.1f} req/sec ({cached / uncached:.2f}x)")
+    print(f"identity in token:     {claims:8.1f} req/sec ({claims / uncached:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Onboard a class: time create_cohort_plans for N students against
+creating the same plans one student at a time (the POST /plans/ path).
+
+Uses a throwaway SQLite database unless DATABASE_URL is already set.
+Run from backend/:
+    python -m benchmarks.bench_cohort [--students 1000] [--days 120]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_cohort.db")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+import app.models  # noqa: E402,F401
+from app.models.plan_progress import PlanProgress  # noqa: E402
+from app.models.study_plan import StudyPlan  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.cohort_service import create_cohort_plans  # noqa: E402
+from app.services.plan_generator import generate_structured_plan  # noqa: E402
+from app.services.plan_stats_service import init_plan_stats  # noqa: E402
+from app.services.plan_store import insert_plan_days  # noqa: E402
+
+LEVELS = ["beginner", "intermediate", "advanced"]
+
+
+def make_users(db, count, offset):
+    db.execute(insert(User), [
+        {"name": f"Student {i}", "email": f"student{i}@example.com", "password_hash": "x"}
+        for i in range(offset, offset + count)
+    ])
+    db.commit()
+    return [u.id for u in db.query(User).order_by(User.id).offset(offset).limit(count)]
+
+
+def make_members(user_ids):
+    return [
+        SimpleNamespace(user_id=user_id, level=LEVELS[i % 3], study_hours_per_day=2 + i % 3)
+        for i, user_id in enumerate(user_ids)
+    ]
+
+
+def one_at_a_time(db, template, members):
+    for member in members:
+        days = generate_structured_plan(template.exam_date, member.study_hours_per_day, template.topics, member.level)
+        plan = StudyPlan(
+            user_id=member.user_id,
+            exam_name=template.exam_name,
+            subject=template.subject,
+            exam_date=template.exam_date,
+            study_hours_per_day=member.study_hours_per_day,
+            level=member.level,
+            status="active"
+        )
+        db.add(plan)
+        db.flush()
+        db.execute(insert(PlanProgress), [
+            {"study_plan_id": plan.id, "date": date.fromisoformat(day["date"])} for day in days
+        ])
+        insert_plan_days(db, plan.id, days, member.study_hours_per_day)
+        init_plan_stats(db, plan.id, len(days))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--baseline-students", type=int, default=100)
+    parser.add_argument("--days", type=int, default=120)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    template = SimpleNamespace(
+        exam_name="Finals",
+        subject="Mathematics",
+        exam_date=date.today() + timedelta(days=args.days),
+        topics=["Algebra", "Calculus", "Geometry", "Probability", "Statistics"]
+    )
+
+    db = SessionLocal()
+    try:
+        cohort_members = make_members(make_users(db, args.students, 0))
+        baseline_members = make_members(make_users(db, args.baseline_students, args.students))
+
+        start = time.perf_counter()
+        result = create_cohort_plans(db, template, cohort_members)
+        cohort_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        one_at_a_time(db, template, baseline_members)
+        baseline_seconds = time.perf_counter() - start
+    finally:
+        db.close()
+
+    per_student = baseline_seconds / args.baseline_students
+
+    print(f"cohort:         {args.students} students in {cohort_seconds:.2f}s "
+          f"({args.students / cohort_seconds:.0f} students/sec, "
+          f"{result['schedules_generated']} schedules generated)")
+    print(f"one at a time:  {args.baseline_students} students in {baseline_seconds:.2f}s "
+          f"(~{per_student * args.students:.1f}s projected for {args.students})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare PDF ingestion embedding throughput: one encode call per chunk
+(old path) vs batched encode into a preallocated array (new path), both
+with the embedding cache disabled, plus a re-ingestion pass with a warm
+in-memory cache.
+
+Run from backend/:
+    python -m benchmarks.bench_embedding [pdf_path] [--batch-size N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services import embedding_service
+from app.services.embedding_service import EmbeddingCache, generate_embedding, generate_embeddings
+from app.services.rag_service import chunk_text, extract_text_from_pdf
+
+
+def synthetic_chunks(count: int):
+    sentence = "The derivative measures the instantaneous rate of change of a function. "
+    return [(sentence * 8)[:500] + str(i) for i in range(count)]
+
+
+def per_chunk(chunks):
+    return np.vstack([generate_embedding(chunk) for chunk in chunks])
+
+
+def batched(chunks, batch_size):
+    return generate_embeddings(chunks, batch_size=batch_size)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf_path", nargs="?")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.pdf_path:
+        chunks = chunk_text(extract_text_from_pdf(args.pdf_path))
+    else:
+        chunks = synthetic_chunks(args.chunks)
+
+    dim = embedding_service.EMBEDDING_DIMENSION
+    embedding_service.embedding_cache = EmbeddingCache(None, 0, dim)
+
+    # Warm up the model so neither path pays first-call overhead
+    generate_embeddings(chunks[:8])
+
+    old, old_seconds = timed(per_chunk, chunks)
+    new, new_seconds = timed(batched, chunks, args.batch_size)
+
+    embedding_service.embedding_cache = EmbeddingCache(None, len(chunks), dim)
+    batched(chunks, args.batch_size)
+    _, cached_seconds = timed(batched, chunks, args.batch_size)
+
+    print(f"chunks:             {len(chunks)}")
+    print(f"per-chunk encode:   {len(chunks) / old_seconds:8.1f} chunks/sec")
+    print(f"batched encode:     {len(chunks) / new_seconds:8.1f} chunks/sec (batch_size={args.batch_size})")
+    print(f"speedup:            {old_seconds / new_seconds:8.2f}x")
+    print(f"warm cache:         {len(chunks) / cached_seconds:8.1f} chunks/sec")
+    print(f"max abs difference: {float(np.abs(old - new).max()):.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Track cold-start latency of the API: time `import app.main` in fresh
+interpreters, and optionally the cost of warm_up() afterwards.
+
+Run from backend/:
+    python -m benchmarks.bench_startup [--runs N] [--warm-up]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+if {warm_up}:
+    from app.services.providers import warm_up
+    warm_up()
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def run_once(warm_up: bool):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(warm_up=warm_up)],
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true")
+    args = parser.parse_args()
+
+    samples = [run_once(args.warm_up) for _ in range(args.runs)]
+    imports = [s[0] for s in samples]
+
+    print(f"runs:               {args.runs}")
+    print(f"import app.main:    median {statistics.median(imports) * 1000:8.1f} ms, "
+          f"max {max(imports) * 1000:8.1f} ms")
+
+    if args.warm_up:
+        warmups = [s[1] for s in samples]
+        print(f"warm_up():          median {statistics.median(warmups) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare VECTOR_STORAGE modes on a synthetic corpus: memory per vector,
+query latency and recall@k against exact float32 flat search.
+
+The corpus is clustered, normalized 384-dim vectors (roughly how
+sentence embeddings of one subject's material are distributed), and
+queries are perturbed corpus points.
+Run from backend/:
+    python -m benchmarks.bench_vector_storage [--vectors 50000] [--queries 500] [--k 10]
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from app.services.vector_store import build_index, dimension
+
+STORAGES = ["flat", "fp16", "int8", "pq"]
+
+
+def normalized(x):
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype("float32")
+
+
+def synthetic_corpus(count: int, queries: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension))
+    assignment = rng.integers(0, clusters, size=count)
+    corpus = normalized(centers[assignment] + 0.6 * rng.standard_normal((count, dimension)))
+
+    picks = rng.integers(0, count, size=queries)
+    query_vectors = normalized(corpus[picks] + 0.05 * rng.standard_normal((queries, dimension)))
+
+    return corpus, query_vectors
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, queries, k, truth):
+    start = time.perf_counter()
+    _, batched = index.search(queries, k)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    for row in range(len(queries)):
+        index.search(queries[row:row + 1], k)
+    single_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    return {
+        "bytes_per_vector": faiss.serialize_index(index).nbytes / index.ntotal,
+        "single_ms": single_ms,
+        "batch_ms": batch_ms,
+        "recall": recall_at_k(batched, truth)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+
+    corpus, queries = synthetic_corpus(args.vectors, args.queries, args.clusters)
+
+    exact = faiss.IndexFlatL2(dimension)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"vectors: {args.vectors}  queries: {args.queries}  k: {args.k}  threads: {args.threads}")
+    print(f"{'storage':<8} {'ivf':<4} {'bytes/vec':>10} {'build s':>8} {'ms/query':>9} {'ms/q batch':>11} {f'recall@{args.k}':>10}")
+
+    for ivf in (False, True):
+        for storage in STORAGES:
+            start = time.perf_counter()
+            index = build_index(corpus, storage, ivf)
+            build_seconds = time.perf_counter() - start
+
+            r = measure(index, queries, args.k, truth)
+            print(
+                f"{storage:<8} {'yes' if ivf else 'no':<4} {r['bytes_per_vector']:>10.1f} {build_seconds:>8.2f} "
+                f"{r['single_ms']:>9.3f} {r['batch_ms']:>11.3f} {r['recall']:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
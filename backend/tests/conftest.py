@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+# app.database builds its engines at import time from DATABASE_URL
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# and app.utils.security reads its token settings the same way
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base  # noqa: E402
+import app.models  # noqa: E402,F401
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
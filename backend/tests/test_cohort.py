@@ -0,0 +1,74 @@
+"""
+Cohort plan creation, through the bulk RETURNING insert and the
+per-plan insert used on dialects that cannot order RETURNING rows
+(MySQL/MariaDB).
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.plan_progress import PlanProgress
+from app.models.plan_stats import PlanStats
+from app.models.study_plan import StudyPlan
+from app.models.user import User
+from app.schemas.study_plan import CohortMember, CohortPlanCreate
+from app.services.cohort_service import create_cohort_plans
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "per-plan"])
+def dialect_returning(request, db, monkeypatch):
+    monkeypatch.setattr(
+        db.get_bind().dialect, "insert_executemany_returning_sort_by_parameter_order", request.param
+    )
+    return request.param
+
+
+def test_plans_match_members_in_order(db, dialect_returning):
+    for i in range(1, 4):
+        db.add(User(id=i, name=f"User {i}", email=f"user{i}@example.com", password_hash="x"))
+    db.commit()
+
+    members = [
+        CohortMember(user_id=3, level="beginner", study_hours_per_day=2),
+        CohortMember(user_id=1, level="advanced", study_hours_per_day=4),
+        CohortMember(user_id=2, level="beginner", study_hours_per_day=2)
+    ]
+    cohort = CohortPlanCreate(
+        exam_name="Final Exam",
+        subject="Mathematics",
+        exam_date=date.today() + timedelta(days=10),
+        topics=["Algebra", "Geometry"],
+        members=members
+    )
+
+    result = create_cohort_plans(db, cohort, members)
+
+    assert result["plans_created"] == 3
+    assert result["schedules_generated"] == 2
+
+    plans = [db.get(StudyPlan, plan_id) for plan_id in result["plan_ids"]]
+    assert [(p.user_id, p.level, p.study_hours_per_day) for p in plans] == [
+        (m.user_id, m.level, m.study_hours_per_day) for m in members
+    ]
+
+    for plan in plans:
+        days = db.execute(
+            select(func.count()).where(PlanProgress.study_plan_id == plan.id)
+        ).scalar_one()
+        assert days == 10
+        assert db.get(PlanStats, plan.id).total_days == days
+
+
+def test_unknown_members_are_rejected(db, dialect_returning):
+    members = [CohortMember(user_id=99, level="beginner", study_hours_per_day=2)]
+    cohort = CohortPlanCreate(
+        exam_name="Final Exam",
+        subject="Mathematics",
+        exam_date=date.today() + timedelta(days=10),
+        topics=["Algebra"],
+        members=members
+    )
+
+    assert create_cohort_plans(db, cohort, members) == {"error": "Unknown user ids: [99]"}
@@ -0,0 +1,126 @@
+"""
+DocumentRegistry shared by several worker processes, simulated with two
+instances (two owners) on the same SQLite file.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from app.services import document_registry as registry_module
+from app.services.document_registry import DocumentRegistry
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    return str(tmp_path / "documents.sqlite3")
+
+
+def new_job(job_id: str, document: dict, **fields):
+    job = {
+        "job_id": job_id,
+        "user_id": document["user_id"],
+        "document_id": document["id"],
+        "namespace": document["namespace"],
+        "status": "queued",
+        "pages_total": None,
+        "pages_processed": 0,
+        "chunks_added": 0,
+        "chunks_skipped": 0,
+        "chunks_replaced": 0,
+        "error": None,
+        "created_at": time.time(),
+        "finished_at": None
+    }
+    job.update(fields)
+    return job
+
+
+def test_file_is_opened_on_first_use(registry_path):
+    registry = DocumentRegistry(registry_path)
+    assert registry._db is None
+
+    registry.for_user(1)
+    assert registry._db is not None
+
+
+def test_same_content_is_claimed_once(registry_path):
+    registry = DocumentRegistry(registry_path)
+
+    first, created = registry.claim(1, "user_1/notes", "notes.pdf", "hash")
+    again, created_again = registry.claim(1, "user_1/copy", "copy.pdf", "hash")
+
+    assert created and not created_again
+    assert again["namespace"] == "user_1/notes"
+
+
+def test_complete_fails_once_reaped(registry_path, monkeypatch):
+    worker = DocumentRegistry(registry_path)
+    other = DocumentRegistry(registry_path)
+
+    document, _ = worker.claim(1, "user_1/notes", "notes.pdf", "hash")
+    worker.record_progress(document["id"], [3, 4])
+
+    monkeypatch.setattr(registry_module, "DOCUMENT_STALE_SECONDS", -1)
+    reaped = other.reap_stale()
+
+    assert [d["id"] for d in reaped] == [document["id"]]
+    assert list(reaped[0]["chunk_ids"]) == [3, 4]
+    assert worker.complete(document["id"], np.array([3, 4, 5])) is False
+
+
+def test_fresh_ingestion_is_not_reaped(registry_path):
+    worker = DocumentRegistry(registry_path)
+    other = DocumentRegistry(registry_path)
+
+    document, _ = worker.claim(1, "user_1/notes", "notes.pdf", "hash")
+    worker.heartbeat()
+
+    assert other.reap_stale() == []
+    assert worker.complete(document["id"], [1]) is True
+    assert other.in_namespace("user_1/notes")[0]["status"] == "ready"
+
+
+def test_jobs_are_visible_to_every_worker(registry_path):
+    worker = DocumentRegistry(registry_path)
+    other = DocumentRegistry(registry_path)
+
+    document, _ = worker.claim(1, "user_1/notes", "notes.pdf", "hash")
+    worker.add_job(new_job("job-1", document))
+    worker.update_job("job-1", status="running", pages_total=10, pages_processed=4)
+
+    job = other.get_job("job-1")
+    assert (job["status"], job["pages_total"], job["pages_processed"]) == ("running", 10, 4)
+    assert other.get_job("missing") is None
+
+
+def test_reaping_fails_the_ingestion_job(registry_path, monkeypatch):
+    worker = DocumentRegistry(registry_path)
+    other = DocumentRegistry(registry_path)
+
+    document, _ = worker.claim(1, "user_1/notes", "notes.pdf", "hash")
+    worker.add_job(new_job("job-1", document, status="running"))
+
+    monkeypatch.setattr(registry_module, "DOCUMENT_STALE_SECONDS", -1)
+    other.reap_stale()
+
+    job = worker.get_job("job-1")
+    assert job["status"] == "failed"
+    assert job["finished_at"] is not None
+
+
+def test_prune_keeps_unfinished_jobs(registry_path):
+    registry = DocumentRegistry(registry_path)
+    document, _ = registry.claim(1, "user_1/notes", "notes.pdf", "hash")
+    now = time.time()
+
+    registry.add_job(new_job("old", document, status="completed", finished_at=now - 100))
+    registry.add_job(new_job("recent-1", document, status="completed", finished_at=now - 2))
+    registry.add_job(new_job("recent-2", document, status="failed", finished_at=now - 1))
+    registry.add_job(new_job("running", document, status="running"))
+
+    registry.prune_jobs(now - 50, max_entries=2)
+
+    remaining = [j for j in ("old", "recent-1", "recent-2", "running") if registry.get_job(j)]
+    assert remaining == ["recent-2", "running"]
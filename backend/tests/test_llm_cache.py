@@ -0,0 +1,48 @@
+"""
+SQLiteCacheBackend: opened on first use, and a failed write leaves the
+connection usable.
+"""
+
+import os
+
+import pytest
+
+from app.services.llm_cache import SQLiteCacheBackend
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "llm_cache.sqlite3")
+
+
+def test_file_is_opened_on_first_use(cache_path):
+    cache = SQLiteCacheBackend(cache_path, max_entries=10, ttl_seconds=60)
+    assert not os.path.exists(cache_path)
+
+    cache.set("k", "v", tags=["plan:1"])
+    assert os.path.exists(cache_path)
+    assert cache.get("k") == "v"
+
+
+def test_failed_set_is_rolled_back(cache_path):
+    cache = SQLiteCacheBackend(cache_path, max_entries=10, ttl_seconds=60)
+
+    # Fails inside the transaction, after the entry row was written
+    with pytest.raises(Exception):
+        cache.set("bad", "v", tags=[object()])
+
+    assert cache.get("bad") is None
+
+    cache.set("good", "v")
+    assert cache.get("good") == "v"
+    assert cache.size() == 1
+
+
+def test_oldest_entries_are_evicted(cache_path):
+    cache = SQLiteCacheBackend(cache_path, max_entries=2, ttl_seconds=60)
+
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+
+    assert cache.size() == 2
+    assert cache.get("a") is None
@@ -0,0 +1,161 @@
+"""
+LLMGateway against a fake OpenAI client: single-flight coalescing, and
+one concurrency limit shared by blocking calls and streams.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_gateway as gateway_module
+from app.services.llm_gateway import LLMGateway, SharedSemaphore
+
+
+class FakeCompletions:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def create(self, **kwargs):
+        self._enter()
+        try:
+            time.sleep(self.delay)
+        finally:
+            self._exit()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="answer"))])
+
+
+class FakeAsyncCompletions:
+    def __init__(self, sync: FakeCompletions):
+        self.sync = sync
+
+    async def create(self, **kwargs):
+        self.sync._enter()
+
+        async def events():
+            try:
+                await asyncio.sleep(self.sync.delay)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="tok"))])
+            finally:
+                self.sync._exit()
+
+        return events()
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    fake = FakeCompletions(delay=0.05)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    async_client = SimpleNamespace(chat=SimpleNamespace(completions=FakeAsyncCompletions(fake)))
+
+    monkeypatch.setattr(gateway_module, "get_openai_client", lambda: client)
+    monkeypatch.setattr(gateway_module, "get_async_openai_client", lambda: async_client)
+    return fake
+
+
+def new_gateway(max_concurrency: int = 8, model_limits: dict = None) -> LLMGateway:
+    return LLMGateway(max_concurrency, max_concurrency, model_limits or {}, rate=0, burst=1)
+
+
+def run_threads(count: int, target):
+    results = [None] * count
+
+    def run(i):
+        results[i] = target()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_identical_calls_share_one_completion(completions):
+    gateway = new_gateway()
+    messages = [{"role": "user", "content": "hi"}]
+
+    results = run_threads(5, lambda: gateway.chat("m", messages, 0.0))
+
+    assert results == ["answer"] * 5
+    assert completions.calls == 1
+    assert gateway.stats()["coalesced"] == 4
+    assert gateway.stats()["inflight_keys"] == 0
+
+
+def test_different_calls_are_not_coalesced(completions):
+    gateway = new_gateway()
+
+    run_threads(3, lambda: gateway.chat("m", [{"role": "user", "content": threading.current_thread().name}], 0.0))
+
+    assert completions.calls == 3
+    assert gateway.stats()["coalesced"] == 0
+
+
+def test_limit_is_shared_by_calls_and_streams(completions):
+    gateway = new_gateway(max_concurrency=2)
+
+    async def streams():
+        async def one():
+            return [token async for token in gateway.stream_chat("m", [], 0.0)]
+
+        return await asyncio.gather(*(one() for _ in range(4)))
+
+    stream_results = []
+    loop_thread = threading.Thread(target=lambda: stream_results.extend(asyncio.run(streams())))
+    loop_thread.start()
+
+    run_threads(4, lambda: gateway.chat("m", [{"role": "user", "content": threading.current_thread().name}], 0.0))
+    loop_thread.join(5)
+
+    assert stream_results == [["tok"]] * 4
+    assert completions.calls == 8
+    assert completions.max_active == 2
+    assert gateway.stats()["active"] == 0
+
+
+def test_model_limit(completions):
+    gateway = new_gateway(max_concurrency=4, model_limits={"small": 1})
+
+    run_threads(3, lambda: gateway.chat("small", [{"role": "user", "content": threading.current_thread().name}], 0.0))
+
+    assert completions.max_active == 1
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    slots = SharedSemaphore(1)
+
+    async def scenario():
+        await slots.acquire_async()
+
+        waiter = asyncio.ensure_future(slots.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        slots.release()
+        # Free again, not leaked to the cancelled waiter
+        await asyncio.wait_for(slots.acquire_async(), 1)
+        slots.release()
+
+    asyncio.run(scenario())
+
+    with pytest.raises(ValueError):
+        slots.release()
@@ -0,0 +1,56 @@
+"""
+PasswordHasher's queue accounting: work stays counted until it has run,
+even when the caller waiting for it is cancelled.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.security import PasswordHasher, PasswordHasherBusy
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_work_finishes():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow_hash():
+        release.wait(5)
+        finished.set()
+        return "hash"
+
+    async def scenario():
+        caller = asyncio.ensure_future(hasher.run(slow_hash))
+        await asyncio.sleep(0.05)
+
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        # bcrypt is still running on the worker: no room for another call
+        assert hasher.stats()["in_flight"] == 1
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.run(slow_hash)
+
+        release.set()
+        await asyncio.get_running_loop().run_in_executor(None, finished.wait, 5)
+        await asyncio.sleep(0.05)
+
+        assert hasher.stats()["in_flight"] == 0
+        assert await hasher.run(lambda: "next") == "next"
+
+    asyncio.run(scenario())
+
+
+def test_completed_calls_are_counted():
+    hasher = PasswordHasher(workers=2, max_queue=4)
+
+    async def scenario():
+        return await asyncio.gather(*(hasher.run(lambda i=i: i) for i in range(5)))
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+
+    stats = hasher.stats()
+    assert (stats["completed"], stats["in_flight"], stats["queued"], stats["rejected"]) == (5, 0, 0, 0)
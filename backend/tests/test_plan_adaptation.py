@@ -0,0 +1,164 @@
+"""
+Rule-based adaptation applied as a diff against the stored schedule:
+diff_plan_days, the progress upsert (and its pre-migration fallback),
+and adapt_study_plan keeping progress on days it does not change.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.models.plan_progress import PlanProgress
+from app.models.study_plan import StudyPlan
+from app.services import adaptive_engine, plan_store
+from app.services.adaptive_engine import adapt_study_plan
+from app.services.plan_generator import generate_structured_plan
+from app.services.plan_stats_service import init_plan_stats
+from app.services.plan_store import diff_plan_days, insert_plan_days, load_plan_days, reset_progress
+
+TOPICS = ["Algebra", "Geometry", "Calculus"]
+
+
+def store_plan(db, day_count: int = 12, hours: int = 3):
+    exam_date = date.today() + timedelta(days=day_count)
+    days = generate_structured_plan(exam_date, hours, TOPICS, "beginner")
+
+    plan = StudyPlan(
+        user_id=1,
+        exam_name="Final Exam",
+        subject="Mathematics",
+        exam_date=exam_date,
+        study_hours_per_day=hours,
+        level="beginner",
+        status="active"
+    )
+    db.add(plan)
+    db.flush()
+
+    insert_plan_days(db, plan.id, days, hours)
+    for day in days:
+        db.add(PlanProgress(study_plan_id=plan.id, date=date.fromisoformat(day["date"])))
+    init_plan_stats(db, plan.id, len(days))
+
+    db.commit()
+    return plan, days
+
+
+def progress_rows(db, plan):
+    return {
+        row.date: row
+        for row in db.execute(select(PlanProgress).where(PlanProgress.study_plan_id == plan.id)).scalars()
+    }
+
+
+@pytest.fixture
+def analytics(monkeypatch):
+    # Enough to trigger adaptation without touching the hours (see
+    # adapt_study_plan's workload rules); tests adjust it
+    values = {"completion_rate": 35, "missed_days": 0, "consistency_score": 80}
+    monkeypatch.setattr(adaptive_engine, "calculate_plan_analytics", lambda db, plan_id: dict(values))
+    monkeypatch.setattr(adaptive_engine, "calculate_risk_index", lambda analytics: 50)
+    return values
+
+
+def test_diff_reports_changed_new_and_removed_days(db):
+    plan, days = store_plan(db, day_count=6)
+    today = date.today()
+
+    new_days = [dict(day, tasks=list(day["tasks"])) for day in days[:-1]]
+    new_days[1]["tasks"][0] = "Geometry - Something Else"
+    new_days.append({"date": str(today + timedelta(days=30)), "tasks": ["Extra"]})
+
+    changed, removed = diff_plan_days(db, plan, new_days, 3, start=today)
+
+    assert [day["date"] for day in changed] == [new_days[1]["date"], new_days[-1]["date"]]
+    assert removed == [date.fromisoformat(days[-1]["date"])]
+
+
+def test_diff_counts_hours_as_a_change(db):
+    plan, days = store_plan(db, day_count=6)
+
+    changed, removed = diff_plan_days(db, plan, days, 4, start=date.today())
+
+    assert len(changed) == len(days)
+    assert removed == []
+
+
+def test_reset_progress_upserts(db):
+    plan, days = store_plan(db, day_count=4)
+    first = date.fromisoformat(days[0]["date"])
+    extra = first + timedelta(days=100)
+
+    row = progress_rows(db, plan)[first]
+    row_id = row.id
+    row.completed, row.completion_percentage, row.notes = True, 100, "done"
+    db.commit()
+
+    reset_progress(db, plan.id, [first, extra])
+    db.commit()
+    db.expire_all()
+
+    rows = progress_rows(db, plan)
+    assert len(rows) == len(days) + 1
+    # Updated in place, not re-inserted
+    assert rows[first].id == row_id
+    assert (rows[first].completed, rows[first].completion_percentage, rows[first].notes) == (False, 0, None)
+    assert rows[extra].completed is False
+
+
+def test_reset_progress_before_migration(db, monkeypatch):
+    monkeypatch.setattr(plan_store, "_has_progress_unique_index", lambda db: False)
+
+    plan, days = store_plan(db, day_count=4)
+    first = date.fromisoformat(days[0]["date"])
+
+    progress_rows(db, plan)[first].completed = True
+    db.commit()
+
+    reset_progress(db, plan.id, [first])
+    db.commit()
+    db.expire_all()
+
+    rows = progress_rows(db, plan)
+    assert len(rows) == len(days)
+    assert rows[first].completed is False
+
+
+def test_adapt_keeps_unchanged_days(db, analytics):
+    plan, days = store_plan(db)
+    kept = date.fromisoformat(days[2]["date"])
+
+    row = progress_rows(db, plan)[kept]
+    row.completed, row.completion_percentage, row.notes = True, 100, "finished early"
+    db.commit()
+
+    result = adapt_study_plan(db, plan.id)
+
+    assert result["days_changed"] == 0
+    assert result["days_removed"] == 0
+    assert load_plan_days(db, plan) == days
+
+    db.expire_all()
+    row = progress_rows(db, plan)[kept]
+    assert (row.completed, row.notes) == (True, "finished early")
+
+
+def test_adapt_rewrites_days_when_hours_change(db, analytics):
+    analytics["completion_rate"] = 20  # drops the daily hours by one
+
+    plan, days = store_plan(db)
+    kept = date.fromisoformat(days[2]["date"])
+
+    progress_rows(db, plan)[kept].completed = True
+    db.commit()
+
+    result = adapt_study_plan(db, plan.id)
+
+    assert result["new_study_hours_per_day"] == 2
+    assert result["days_changed"] == len(days)
+
+    db.expire_all()
+    rows = progress_rows(db, plan)
+    assert len(rows) == len(days)
+    assert rows[kept].completed is False
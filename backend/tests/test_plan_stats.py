@@ -0,0 +1,96 @@
+"""
+plan_stats bookkeeping for single progress updates, including plans
+created before plan_stats existed (no stats row yet).
+"""
+
+from datetime import date, timedelta
+
+from app.models.plan_progress import PlanProgress
+from app.models.plan_stats import PlanStats
+from app.models.study_plan import StudyPlan
+from app.services.analytics_service import calculate_plan_analytics
+from app.services.plan_stats_service import apply_progress_change, check_plan_stats, init_plan_stats, lock_progress
+
+
+def store_plan(db, day_count: int = 4, with_stats: bool = True):
+    plan = StudyPlan(
+        user_id=1,
+        exam_name="Final Exam",
+        subject="Mathematics",
+        exam_date=date.today() + timedelta(days=day_count),
+        study_hours_per_day=2,
+        level="beginner",
+        status="active"
+    )
+    db.add(plan)
+    db.flush()
+
+    for i in range(day_count):
+        db.add(PlanProgress(study_plan_id=plan.id, date=date.today() + timedelta(days=i)))
+
+    if with_stats:
+        init_plan_stats(db, plan.id, day_count)
+
+    db.commit()
+    return plan
+
+
+def update_progress(db, progress_id: int, completed: bool, percentage: int):
+    # Same order as PATCH /plans/progress/{id}
+    progress = db.execute(lock_progress(progress_id)).scalars().first()
+
+    apply_progress_change(
+        db,
+        progress.study_plan_id,
+        progress.completed,
+        progress.completion_percentage,
+        completed,
+        percentage
+    )
+
+    progress.completed = completed
+    progress.completion_percentage = percentage
+    db.commit()
+
+
+def first_day(db, plan):
+    return db.query(PlanProgress).filter(PlanProgress.study_plan_id == plan.id).order_by(PlanProgress.date).first()
+
+
+def test_update_applies_delta(db):
+    plan = store_plan(db)
+
+    update_progress(db, first_day(db, plan).id, True, 100)
+
+    stats = db.get(PlanStats, plan.id)
+    assert (stats.total_days, stats.completed_days, stats.percentage_sum) == (4, 1, 100)
+    assert stats.last_activity_date == date.today()
+    assert check_plan_stats(db, [plan.id]) == []
+
+
+def test_update_back_and_forth_keeps_stats_exact(db):
+    plan = store_plan(db)
+    day = first_day(db, plan)
+
+    update_progress(db, day.id, True, 100)
+    update_progress(db, day.id, False, 40)
+    update_progress(db, day.id, False, 40)
+
+    stats = db.get(PlanStats, plan.id)
+    assert (stats.completed_days, stats.percentage_sum) == (0, 40)
+    assert check_plan_stats(db, [plan.id]) == []
+
+
+def test_legacy_plan_first_update(db):
+    plan = store_plan(db, with_stats=False)
+    assert db.get(PlanStats, plan.id) is None
+
+    update_progress(db, first_day(db, plan).id, True, 100)
+
+    stats = db.get(PlanStats, plan.id)
+    assert (stats.total_days, stats.completed_days, stats.percentage_sum) == (4, 1, 100)
+    assert stats.last_activity_date == date.today()
+    assert check_plan_stats(db, [plan.id]) == []
+
+    analytics = calculate_plan_analytics(db, plan.id)
+    assert analytics["last_activity_date"] == date.today()
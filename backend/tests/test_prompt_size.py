@@ -0,0 +1,76 @@
+"""
+Prompt-size regression test: store plans of growing length and topic
+count, build the feedback and adaptation prompts through the same
+database-backed path the services use (plan_outline, load_plan_days,
+plan_topics), and fail if any exceeds its PROMPT_BUDGETS entry.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.models.plan_progress import PlanProgress
+from app.models.study_plan import StudyPlan
+from app.services.ai_adaptive_engine import ADAPT_MODEL, ADAPT_SYSTEM_PROMPT, build_partial_adaptive_prompt
+from app.services.ai_service import FEEDBACK_MODEL, FEEDBACK_SYSTEM_PROMPT, calculate_risk_index, prepare_ai_feedback
+from app.services.analytics_service import calculate_plan_analytics
+from app.services.plan_generator import generate_structured_plan
+from app.services.plan_stats_service import init_plan_stats
+from app.services.plan_store import insert_plan_days, load_plan_days, plan_outline, plan_topics
+from app.services.prompt_builder import PROMPT_BUDGETS, count_tokens
+
+
+def store_plan(db, day_count: int, topic_count: int):
+    exam_date = date.today() + timedelta(days=day_count)
+    topics = [f"Topic {i} of the syllabus" for i in range(topic_count)]
+    days = generate_structured_plan(exam_date, 3, topics, "intermediate")
+
+    plan = StudyPlan(
+        user_id=1,
+        exam_name="Final Exam",
+        subject="Mathematics",
+        exam_date=exam_date,
+        study_hours_per_day=3,
+        level="intermediate",
+        status="active"
+    )
+    db.add(plan)
+    db.flush()
+
+    insert_plan_days(db, plan.id, days, 3)
+    db.execute(insert(PlanProgress), [
+        {"study_plan_id": plan.id, "date": date.fromisoformat(str(day["date"])), "completed": False, "completion_percentage": 0}
+        for day in days
+    ])
+    init_plan_stats(db, plan.id, len(days))
+    db.commit()
+
+    return plan, days
+
+
+@pytest.mark.parametrize("topic_count", [5, 40, 200])
+@pytest.mark.parametrize("day_count", [30, 180, 365, 730])
+def test_prompts_stay_within_budget(db, day_count, topic_count):
+    plan, days = store_plan(db, day_count, topic_count)
+
+    outline = plan_outline(db, plan)
+    assert outline["days"] == len(days)
+    assert outline["tasks"] == sum(len(day["tasks"]) for day in days)
+
+    prepared = prepare_ai_feedback(db, plan.id)
+    assert not isinstance(prepared, dict), prepared
+    context_prompt, _ = prepared
+
+    feedback_tokens = count_tokens(FEEDBACK_SYSTEM_PROMPT + context_prompt, FEEDBACK_MODEL)
+    assert feedback_tokens <= PROMPT_BUDGETS["feedback"]
+
+    analytics = calculate_plan_analytics(db, plan.id)
+    today = date.today()
+    next_7_days = load_plan_days(db, plan, today, today + timedelta(days=6))
+
+    adapt_prompt = build_partial_adaptive_prompt(
+        plan, analytics, calculate_risk_index(analytics), next_7_days, plan_topics(db, plan)
+    )
+    adapt_tokens = count_tokens(ADAPT_SYSTEM_PROMPT + adapt_prompt, ADAPT_MODEL)
+    assert adapt_tokens <= PROMPT_BUDGETS["adapt"]
@@ -0,0 +1,187 @@
+"""
+Streaming answers end to end against a local fake of the OpenAI chat
+completions endpoint: the real AsyncOpenAI client, the gateway, the
+answer cache and the SSE framing.
+"""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+from app.services import llm_cache, providers, rag_service
+from app.services.ai_service import stream_ai_feedback
+from app.services.llm_cache import MemoryCacheBackend
+from app.services.rag_service import stream_answer
+from app.utils.sse import sse_stream
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """
+    POST /v1/chat/completions. Streams `tokens` as chat.completion.chunk
+    events, or answers with `status` and an error body when it isn't 200.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.tokens = ["Hello", ", ", "world"]
+        self.status = 200
+        self.requests = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+
+        if self.server.status != 200:
+            payload = json.dumps({"error": {"message": "bad request", "type": "invalid_request_error"}}).encode()
+            self.send_response(self.server.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        assert body["stream"] is True
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        for token in self.server.tokens:
+            self._event({"content": token})
+        self._event({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _event(self, delta: dict, finish_reason: str = None):
+        chunk = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    server = FakeOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    # A client per test, bound to this test's server and event loop
+    monkeypatch.setattr(
+        providers, "_async_openai_client",
+        providers.LazyResource("async_openai_client", providers._make_async_openai_client)
+    )
+    monkeypatch.setattr(llm_cache, "backend", MemoryCacheBackend(100, 60))
+
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def collect(tokens):
+    async def run():
+        return [token async for token in tokens]
+
+    return asyncio.run(run())
+
+
+def parse_events(messages):
+    events = []
+    for message in messages:
+        event = "message"
+        for line in message.strip().split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+def test_sse_stream_frames_tokens_then_done():
+    async def tokens():
+        yield "a"
+        yield "b"
+
+    assert parse_events(collect(sse_stream(tokens(), final={"risk_index": 3}))) == [
+        ("message", {"token": "a"}),
+        ("message", {"token": "b"}),
+        ("done", {"risk_index": 3})
+    ]
+
+
+def test_sse_stream_reports_errors():
+    async def tokens():
+        yield "a"
+        raise RuntimeError("boom")
+
+    assert parse_events(collect(sse_stream(tokens()))) == [
+        ("message", {"token": "a"}),
+        ("error", {"error": "boom"})
+    ]
+
+
+def test_stream_answer_streams_then_serves_from_cache(openai_server, monkeypatch):
+    messages = [{"role": "user", "content": "What is in the notes?"}]
+    monkeypatch.setattr(rag_service, "build_rag_messages", lambda question, namespaces: messages)
+
+    assert collect(stream_answer("What is in the notes?", ["default"])) == ["Hello", ", ", "world"]
+
+    request = openai_server.requests[0]
+    assert request["model"] == rag_service.RAG_MODEL
+    assert request["messages"] == messages
+
+    # Replayed whole from the cache, without another request
+    assert collect(stream_answer("What is in the notes?", ["default"])) == ["Hello, world"]
+    assert len(openai_server.requests) == 1
+
+
+def test_stream_ai_feedback_over_sse(openai_server):
+    events = parse_events(collect(sse_stream(stream_ai_feedback(7, "context"), final={"risk_index": 42.0})))
+
+    assert events == [
+        ("message", {"token": "Hello"}),
+        ("message", {"token": ", "}),
+        ("message", {"token": "world"}),
+        ("done", {"risk_index": 42.0})
+    ]
+
+    request = openai_server.requests[0]
+    assert request["max_tokens"] > 0
+    assert request["messages"][-1]["content"] == "context"
+
+    # Cached under the plan's tag, so invalidating the plan drops it
+    llm_cache.invalidate_plan(7)
+    collect(stream_ai_feedback(7, "context"))
+    assert len(openai_server.requests) == 2
+
+
+def test_api_error_becomes_sse_error_and_is_not_cached(openai_server):
+    openai_server.status = 400
+
+    events = parse_events(collect(sse_stream(stream_ai_feedback(8, "context"))))
+    assert [event for event, _ in events] == ["error"]
+    assert "bad request" in events[0][1]["error"]
+
+    openai_server.status = 200
+    assert collect(stream_ai_feedback(8, "context")) == ["Hello", ", ", "world"]
@@ -0,0 +1,131 @@
+"""
+Namespaces on disk: add/remove/snapshot, the in-memory namespace cache,
+and two worker processes writing one namespace (simulated with two
+PersistentIndex instances on the same directory; flock treats each open
+of the directory separately, as it would across processes).
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.services import vector_store
+from app.services.vector_store import PersistentIndex, dimension
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_store, "_namespaces", type(vector_store._namespaces)())
+    return tmp_path
+
+
+def vectors(count: int, seed: int = 0):
+    return np.random.default_rng(seed).random((count, dimension), dtype="float32")
+
+
+def test_adds_are_searchable_after_snapshot():
+    data = vectors(3)
+    ids = vector_store.add_embeddings(data, ["a", "b", "c"], "ns")
+    assert list(ids) == [0, 1, 2]
+
+    # Pending adds live in the writable copy only
+    assert vector_store.search(data[1:2], 1, "ns") == []
+
+    vector_store.snapshot_namespace("ns")
+    assert vector_store.search(data[1:2], 1, "ns") == ["b"]
+    assert sorted(vector_store.namespace_ids("ns")) == [0, 1, 2]
+
+
+def test_remove_drops_vectors_and_texts():
+    data = vectors(3)
+    vector_store.add_embeddings(data, ["a", "b", "c"], "ns")
+    vector_store.snapshot_namespace("ns")
+
+    assert vector_store.remove_embeddings([1], "ns") == 1
+    assert sorted(vector_store.namespace_ids("ns")) == [0, 2]
+    assert "b" not in vector_store.search(data[1:2], 3, "ns")
+
+    store = vector_store.get_namespace("ns")
+    assert store.chunks.get(1) is None
+
+    # Ids are never reused
+    assert list(vector_store.add_embeddings(vectors(1, 1), ["d"], "ns")) == [3]
+
+
+def test_unknown_namespace_opens_nothing(store_dir):
+    assert vector_store.get_namespace("missing") is None
+    assert vector_store.search(vectors(1), 3, "missing") == []
+    assert not (store_dir / "missing").exists()
+
+
+def test_eviction_skips_pending_stores(monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_NAMESPACE_CACHE", 1)
+
+    vector_store.add_embeddings(vectors(1), ["a"], "first")
+    first = vector_store.get_namespace("first")
+
+    vector_store.add_embeddings(vectors(1), ["b"], "second")
+    assert "first" in vector_store._namespaces  # unsaved adds
+
+    vector_store.snapshot_namespace("first")
+    vector_store.snapshot_namespace("second")
+    vector_store.get_namespace("third", create=True)
+
+    assert list(vector_store._namespaces) == ["third"]
+    assert first.retired
+
+    # Reopened from disk
+    assert vector_store.search(vectors(1), 1, "first") == ["a"]
+
+
+def test_drop_namespace(store_dir):
+    vector_store.add_embeddings(vectors(1), ["a"], "ns")
+    vector_store.drop_namespace("ns")
+
+    assert not (store_dir / "ns").exists()
+    assert vector_store.get_namespace("ns") is None
+
+
+def test_second_writer_waits_and_continues_ids(tmp_path):
+    directory = str(tmp_path / "shared")
+    first = PersistentIndex(directory)
+    second = PersistentIndex(directory)
+
+    first.add(vectors(2), ["a", "b"])
+
+    result = {}
+    writer = threading.Thread(target=lambda: result.update(ids=second.add(vectors(2, 1), ["c", "d"])))
+    writer.start()
+
+    # Blocked on first's file lock while first has unsaved adds
+    writer.join(0.2)
+    assert writer.is_alive()
+
+    first.snapshot()
+    writer.join(5)
+    second.snapshot()
+
+    assert list(result["ids"]) == [2, 3]
+
+    first.refresh()
+    assert sorted(vector_store.index_ids(first.index)) == [0, 1, 2, 3]
+    assert [first.chunks.get(i) for i in range(4)] == ["a", "b", "c", "d"]
+
+
+def test_remove_sees_other_writers_snapshot(tmp_path):
+    directory = str(tmp_path / "shared")
+    first = PersistentIndex(directory)
+    second = PersistentIndex(directory)
+
+    first.add(vectors(2), ["a", "b"])
+    first.snapshot()
+
+    # second opened before first wrote anything
+    assert second.remove([0]) == 1
+
+    first.refresh()
+    assert list(vector_store.index_ids(first.index)) == [1]
+    assert first.chunks.get(0) is None
+    assert first.chunks.get(1) == "b"